@@ -1,64 +1,48 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm.session import Session
-from sqlalchemy.sql.functions import func
-from app.core.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from app.core.database import AsyncSessionLocal, get_async_db
+from app.api.deps import get_ai_service, get_binance_service, get_trading_executor
+from app.api.metrics import metrics_cache
+from app.api.trading import chat_decision_columns, serialize_chat, serialize_trade
 from app.services.binance_service import BinanceService
 from app.services.ai_service import AIService
 from app.services.trading_executor import TradingExecutor
-from app.models.trading import Metrics as MetricsModel
+from app.services.event_hub import event_hub
+from app.services import metric_store
 from app.models.trading import Chat, Trading
 from app.core.security import verify_token
 from app.core.config import settings
+import asyncio
 import json
 import logging
-from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# 最大指标数量
-MAX_METRICS_COUNT = 100
+# 同一个任务不允许并发执行（调度器触发和手动HTTP触发共用这两把锁）
+_decision_lock = asyncio.Lock()
+_metrics_lock = asyncio.Lock()
 
 
-def uniform_sample_with_boundaries(data: list, max_size: int) -> list:
-    """均匀采样数组，保持首尾元素不变"""
-    if len(data) <= max_size:
-        return data
-
-    result = []
-    step = (len(data) - 1) / (max_size - 1)
-
-    for i in range(max_size):
-        index = round(i * step)
-        result.append(data[index])
-
-    return result
-
-
-@router.get("/3-minutes-run-interval")
-async def run_trading_decision(
-    token: str = Query(..., description="Cron authentication token"),
-    db: Session = Depends(get_db)
-):
-    """每3分钟执行一次AI交易决策"""
-    # 验证token
-    if not verify_token(token):
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    try:
-        # 初始化服务
-        binance_service = BinanceService()
-        ai_service = AIService()
-        trading_executor = TradingExecutor()
-        
-        # 获取市场状态和账户信息
-        market_state = await binance_service.get_current_market_state("DOGE/USDT")
+async def execute_trading_decision(
+    db: AsyncSession,
+    binance_service: BinanceService,
+    ai_service: AIService,
+    trading_executor: TradingExecutor
+) -> Dict[str, Any]:
+    """执行一次AI交易决策：生成决策、保存聊天记录并执行交易"""
+    async with _decision_lock:
+        # 获取市场状态和账户信息（交易决策不使用缓存中可能已过期的市场状态）
+        market_state = await binance_service.get_current_market_state("DOGE/USDT", force=True)
         account_info = await binance_service.get_account_information_and_performance(
             settings.START_MONEY
         )
         
-        # 调用AI生成决策
-        ai_response = ai_service.run_trading_decision(market_state, account_info)
+        # 调用AI生成决策（同步的HTTP请求放到线程中执行，不阻塞事件循环）
+        ai_response = await asyncio.to_thread(ai_service.run_trading_decision, market_state, account_info)
         
         # 解析AI决策
         decision_content = ai_response["content"]
@@ -77,81 +61,111 @@ async def run_trading_decision(
             user_prompt=json.dumps({  # type: ignore
                 "market_state": market_state,
                 "account_info": account_info
-            })
+            }),
+            **chat_decision_columns(decision_content)
         )
         db.add(chat)
-        db.commit()
-        db.refresh(chat)
+        await db.commit()
+        await db.refresh(chat)
+        event_hub.publish("chat", serialize_chat(chat))
         
         # 执行交易，传递chat_id
-        execution_result = trading_executor.execute_trade("DOGE/USDT", decision_data, chat.id)
+        execution_result = await trading_executor.execute_trade("DOGE/USDT", decision_data, chat.id)
+        
+        # 推送本次决策产生的交易记录（关联的聊天记录在同一条语句中加载）
+        trades = await db.execute(
+            select(Trading).join(Trading.chat).options(
+                contains_eager(Trading.chat).load_only(Chat.model, Chat.created_at)
+            ).where(Trading.chat_id == chat.id)
+        )
+        for trade in trades.scalars():
+            event_hub.publish("trade", serialize_trade(trade))
         
         return {
             "message": "Trading decision executed successfully",
             "decision": decision_data,
             "execution_result": execution_result
         }
+
+
+async def execute_metrics_collection(db: AsyncSession, binance_service: BinanceService) -> Dict[str, Any]:
+    """采集一次账户指标"""
+    async with _metrics_lock:
+        # 获取账户信息
+        account_info = await binance_service.get_account_information_and_performance(
+            settings.START_MONEY
+        )
+        
+        # 追加一个指标点（过期的点按保留策略删除）
+        point = await db.run_sync(metric_store.record_point, account_info)
+        
+        # 写入指标缓存并推送新的指标点（格式与 /api/metrics 中的点一致）
+        metric = metric_store.serialize_point(point)
+        metrics_cache.append(metric)
+        event_hub.publish("metric", metric)
+        
+        return {
+            "message": "Metrics collected successfully",
+            "created_at": metric_store.isoformat_utc(point.created_at)
+        }
+
+
+@router.get("/3-minutes-run-interval")
+async def run_trading_decision(
+    token: str = Query(..., description="Cron authentication token"),
+    db: AsyncSession = Depends(get_async_db),
+    binance_service: BinanceService = Depends(get_binance_service),
+    ai_service: AIService = Depends(get_ai_service),
+    trading_executor: TradingExecutor = Depends(get_trading_executor)
+):
+    """手动触发一次AI交易决策（定时执行由进程内调度器负责）"""
+    # 验证token
+    if not verify_token(token):
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    try:
+        return await execute_trading_decision(db, binance_service, ai_service, trading_executor)
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/20-seconds-metrics-interval")
 async def collect_metrics(
     token: str = Query(..., description="Cron authentication token"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db),
+    binance_service: BinanceService = Depends(get_binance_service)
 ):
-    """每20秒收集账户指标"""
+    """手动触发一次账户指标采集（定时执行由进程内调度器负责）"""
     # 验证token
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="Invalid token")
 
     try:
-        # 初始化服务
-        binance_service = BinanceService()
-        
-        # 获取账户信息
-        account_info = await binance_service.get_account_information_and_performance(
-            settings.START_MONEY
-        )
-        
-        # 获取现有指标
-        existing_metrics = db.query(MetricsModel).filter(
-            MetricsModel.model == "Deepseek"  # type: ignore
-        ).first()
-        
-        if not existing_metrics:
-            # 创建新的指标记录
-            existing_metrics = MetricsModel(
-                name="20-seconds-metrics",  # type: ignore
-                model="Deepseek",  # type: ignore
-                metrics=[]  # type: ignore
-            )
-            db.add(existing_metrics)
-            db.flush()
-        
-        # 添加新指标
-        new_metric = {
-            "accountInformationAndPerformance": account_info,
-            "createdAt": datetime.now().isoformat()
-        }
-        
-        # 将SQLAlchemy列转换为普通Python对象
-        current_metrics = existing_metrics.metrics if existing_metrics.metrics is not None else []
-        if not isinstance(current_metrics, list):
-            current_metrics = []
-        
-        # 更新指标数据
-        updated_metrics = current_metrics[-(MAX_METRICS_COUNT-1):] + [new_metric] if current_metrics else [new_metric]
-        
-        # 使用setattr来避免类型检查问题
-        setattr(existing_metrics, 'metrics', updated_metrics)
-        db.commit()
-        
-        return {
-            "message": "Metrics collected successfully",
-            "metrics_count": len(updated_metrics)
-        }
+        return await execute_metrics_collection(db, binance_service)
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _run_scheduled(name: str, job: Callable[[AsyncSession], Awaitable[Dict[str, Any]]]) -> None:
+    async with AsyncSessionLocal() as db:
+        try:
+            await job(db)
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Scheduled job {name} failed: {e}")
+
+
+async def scheduled_trading_decision() -> None:
+    """调度器任务：直接执行交易决策，不经过HTTP和token校验"""
+    await _run_scheduled("trading_decision", lambda db: execute_trading_decision(
+        db, get_binance_service(), get_ai_service(), get_trading_executor()
+    ))
+
+
+async def scheduled_metrics_collection() -> None:
+    """调度器任务：直接采集账户指标"""
+    await _run_scheduled("metrics_collection", lambda db: execute_metrics_collection(
+        db, get_binance_service()
+    ))
@@ -0,0 +1,21 @@
+from functools import lru_cache
+from app.services.ai_service import AIService
+from app.services.binance_service import BinanceService
+from app.services.trading_executor import TradingExecutor
+
+
+# 应用级单例：所有请求共用同一组服务实例（以及同一个交易所客户端和HTTP会话）
+
+@lru_cache()
+def get_binance_service() -> BinanceService:
+    return BinanceService()
+
+
+@lru_cache()
+def get_ai_service() -> AIService:
+    return AIService()
+
+
+@lru_cache()
+def get_trading_executor() -> TradingExecutor:
+    return TradingExecutor()
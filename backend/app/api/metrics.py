@@ -1,108 +1,183 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.models.trading import Metrics as MetricsModel
+from app.core.database import get_async_db
+from app.core.http_cache import check_conditional, make_etag, not_modified
+from app.services import metric_store
+from app.services.downsampling import lttb_indices
+from collections import deque
 from datetime import datetime
-import time
 import threading
-from typing import List, Dict, Any, Optional
-import hashlib
-import json
-
-# 添加线程安全的内存缓存
-class ThreadSafeMetricsCache:
-    def __init__(self):
-        self.cache = None
-        self.expiry = 0
-        self.ttl = 15  # 增加缓存时间到15秒，减少数据库查询频率
+import uuid
+from typing import List, Dict, Any, Deque, Optional, Tuple
+
+# 默认返回最新的150个点；指定时间范围时最多返回的点数（超过时用LTTB降采样）
+DEFAULT_METRICS_LIMIT = 150
+MAX_RANGE_POINTS = 1000
+# 时间范围查询最多从数据库读取的点数，自动分辨率也以此为上限选择层级
+MAX_QUERY_POINTS = 10000
+
+
+class VersionedMetricsCache:
+    """最新指标点的写穿透缓存
+
+    采集到新点时直接追加到缓存并递增版本号，读取时不再按TTL过期，
+    也不需要序列化整个结果计算哈希：ETag由进程标识和版本号组成。
+    """
+
+    def __init__(self, maxlen: int = DEFAULT_METRICS_LIMIT):
+        self._points: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        # 加载前写入的新点：读取数据库和加载缓存之间提交的点不在查询结果中，加载时合并
+        self._pending: Deque[Dict[str, Any]] = deque(maxlen=maxlen)
+        self._loaded = False
+        self._result: Optional[Dict[str, Any]] = None
         self._lock = threading.Lock()
-        self.data_hash = None  # 用于检测数据是否真正发生变化
-    
-    def get(self):
+        # 进程重启后版本号从头开始，加上进程标识避免与旧ETag冲突
+        self._epoch = uuid.uuid4().hex[:8]
+        self.version = 0
+
+    @property
+    def tag(self) -> str:
+        return f"{self._epoch}:{self.version}"
+
+    def get(self) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """返回(结果, 版本标识)，尚未从数据库加载时返回(None, None)"""
         with self._lock:
-            if self.cache and time.time() < self.expiry:
-                return self.cache
-            return None
-    
-    def set(self, data):
+            if not self._loaded:
+                return None, None
+            if self._result is None:
+                points = list(self._points)
+                self._result = build_metrics_result(
+                    points, metric_store.RAW_RESOLUTION,
+                    datetime.fromisoformat(points[-1]["createdAt"]) if points else None
+                )
+            return self._result, self.tag
+
+    def load(self, points: List[Dict[str, Any]]) -> None:
+        """用数据库中最新的点初始化缓存，并合并查询之后才写入的点"""
         with self._lock:
-            # 计算数据的哈希值以检测变化
-            data_str = json.dumps(data, sort_keys=True, default=str)
-            new_hash = hashlib.md5(data_str.encode()).hexdigest()
-            
-            # 只有在数据真正发生变化时才更新缓存
-            if new_hash != self.data_hash:
-                self.cache = data
-                self.data_hash = new_hash
-            
-            self.expiry = time.time() + self.ttl
-
-metrics_cache = ThreadSafeMetricsCache()
+            if self._loaded:
+                # 其他请求已经先加载（之后的新点也已追加），不能用这次较旧的查询结果覆盖
+                return
+            latest = points[-1]["createdAt"] if points else ""
+            self._points.extend(points)
+            self._points.extend(point for point in self._pending if point["createdAt"] > latest)
+            self._pending.clear()
+            self._loaded = True
+            self._result = None
+            self.version += 1
+
+    def append(self, point: Dict[str, Any]) -> None:
+        """写入新指标点后调用：追加到缓存并递增版本号（未加载时先暂存，加载时合并）"""
+        with self._lock:
+            if not self._loaded:
+                self._pending.append(point)
+                return
+            self._points.append(point)
+            self._result = None
+            self.version += 1
+
+metrics_cache = VersionedMetricsCache()
 
 router = APIRouter()
 
+
 @router.get("/")
-async def get_metrics(db: Session = Depends(get_db)):
-    """获取指标数据"""
-    # 检查缓存
-    cached_data = metrics_cache.get()
-    if cached_data:
-        return cached_data
-    
+async def get_metrics(
+    request: Request,
+    response: Response,
+    start: Optional[datetime] = Query(None, alias="from", description="起始时间（ISO格式，包含）"),
+    end: Optional[datetime] = Query(None, alias="to", description="结束时间（ISO格式，包含）"),
+    resolution: str = Query("auto", description="分辨率：auto、20s、5m、1h、1d"),
+    max_points: Optional[int] = Query(None, ge=3, le=MAX_RANGE_POINTS, description="最多返回的点数（LTTB降采样）"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """获取指标数据，支持按时间范围和分辨率查询，以及ETag/Last-Modified条件请求"""
+    if resolution != "auto" and resolution not in metric_store.RESOLUTION_SECONDS:
+        raise HTTPException(status_code=400, detail=f"Unsupported resolution: {resolution}")
     try:
-        # 优化查询：只获取最新的记录，并限制返回的字段
-        latest_metric = db.query(MetricsModel) \
-                         .filter(MetricsModel.model == "Deepseek") \
-                         .order_by(MetricsModel.created_at.desc()) \
-                         .first()
-        
-        if not latest_metric:
-            result = {
-                "success": True,
-                "data": {
-                    "metrics": [],
-                    "totalCount": 0,
-                    "model": "Deepseek",
-                    "name": "20-seconds-metrics",
-                },
-            }
-            metrics_cache.set(result)
-            return result
-        
-        # 优化处理指标数据
-        metrics_data: List[Dict[str, Any]] = []
-        if latest_metric.metrics and isinstance(latest_metric.metrics, list):
-            # 限制返回的指标数据数量，只返回最新的150条记录以提高性能
-            metrics_list = latest_metric.metrics
-            if len(metrics_list) > 150:
-                metrics_list = metrics_list[-150:]  # 只取最新的150条
-                
-            # 批量处理数据以提高性能
-            for metric in metrics_list:
-                if isinstance(metric, dict):
-                    # 使用get方法安全访问嵌套字段
-                    account_info = metric.get("accountInformationAndPerformance", {})
-                    metrics_data.append({
-                        "totalCashValue": account_info.get("totalCashValue", 0),
-                        "currentTotalReturn": account_info.get("currentTotalReturn", 0),
-                        "createdAt": metric.get("createdAt", ""),
-                    })
-        
-        result = {
-            "success": True,
-            "data": {
-                "metrics": metrics_data,
-                "totalCount": len(metrics_data),
-                "model": latest_metric.model,
-                "name": latest_metric.name,
-                "createdAt": latest_metric.created_at.isoformat() if latest_metric.created_at else "",
-                "updatedAt": latest_metric.updated_at.isoformat() if latest_metric.updated_at else "",
-            },
-        }
-        
-        # 缓存结果
-        metrics_cache.set(result)
-        
-        return result
+        result, data_hash = await db.run_sync(
+            load_metrics, metric_store.to_utc(start), metric_store.to_utc(end), resolution, max_points
+        )
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # 数据未变化时直接返回304，不再序列化响应体
+    updated_at = result["data"].get("updatedAt")
+    is_not_modified, headers = check_conditional(
+        request, make_etag(data_hash), datetime.fromisoformat(updated_at) if updated_at else None
+    )
+    if is_not_modified:
+        return not_modified(headers)
+    response.headers.update(headers)
+    return result
+
+
+def build_metrics_result(metrics_data: List[Dict[str, Any]], resolution: str,
+                         updated_at: Optional[datetime]) -> Dict[str, Any]:
+    """把指标点（或聚合时间桶）组装成接口返回格式"""
+    return {
+        "success": True,
+        "data": {
+            "metrics": metrics_data,
+            "totalCount": len(metrics_data),
+            "model": metric_store.DEFAULT_MODEL,
+            "name": "20-seconds-metrics",
+            "resolution": resolution,
+            "createdAt": metrics_data[0]["createdAt"] if metrics_data else "",
+            "updatedAt": metric_store.isoformat_utc(metric_store.to_utc(updated_at)),
+        },
+    }
+
+
+def downsample_metrics(metrics_data: List[Dict[str, Any]], max_points: int) -> List[Dict[str, Any]]:
+    """按总资产曲线做LTTB降采样，保留首尾点以及尖峰和回撤"""
+    if len(metrics_data) <= max_points:
+        return metrics_data
+    x = [datetime.fromisoformat(metric["createdAt"]).timestamp() for metric in metrics_data]
+    y = [metric["totalCashValue"] for metric in metrics_data]
+    return [metrics_data[i] for i in lttb_indices(x, y, max_points)]
+
+
+def load_metrics(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 resolution: str = "auto", max_points: Optional[int] = None):
+    """读取指标数据，返回(结果, 内容哈希)；异步接口通过 AsyncSession.run_sync 调用
+
+    不带时间范围时返回最新的原始点（使用缓存）；带时间范围时按时间索引查询，
+    resolution为auto时选择点数仍能填满max_points的最粗聚合层级，不读取多余的原始点。
+    点数超过max_points（时间范围查询默认MAX_RANGE_POINTS）时做LTTB降采样。
+    """
+    if resolution == "auto":
+        resolution = metric_store.RAW_RESOLUTION if start is None else \
+            metric_store.choose_resolution(start, end or metric_store.utc_now(), max_points or MAX_RANGE_POINTS,
+                                           max_rows=MAX_QUERY_POINTS)
+    
+    if start is None and end is None and resolution == metric_store.RAW_RESOLUTION:
+        # 检查缓存（新指标点由采集任务写入缓存，这里只在首次读取时访问数据库）
+        cached_data, data_hash = metrics_cache.get()
+        if cached_data is None:
+            points = metric_store.query_points(db, limit=DEFAULT_METRICS_LIMIT)
+            metrics_cache.load([metric_store.serialize_point(point) for point in points])
+            cached_data, data_hash = metrics_cache.get()
+        if max_points is None or cached_data["data"]["totalCount"] <= max_points:
+            return cached_data, data_hash
+        metrics_data = downsample_metrics(cached_data["data"]["metrics"], max_points)
+        result = {**cached_data, "data": {**cached_data["data"], "metrics": metrics_data,
+                                          "totalCount": len(metrics_data)}}
+        return result, f"{data_hash}|{max_points}"
+    
+    if resolution == metric_store.RAW_RESOLUTION:
+        points = metric_store.query_points(db, start, end, limit=MAX_QUERY_POINTS)
+        metrics_data = [metric_store.serialize_point(point) for point in points]
+        updated_at = points[-1].created_at if points else None
+    else:
+        rollups = metric_store.query_rollups(db, resolution, start, end, limit=MAX_QUERY_POINTS)
+        metrics_data = [metric_store.serialize_rollup(rollup) for rollup in rollups]
+        # 最后一个时间桶会持续更新，用桶内最后一个点的时间作为修改时间
+        updated_at = rollups[-1].last_point_at if rollups else None
+    
+    result = build_metrics_result(downsample_metrics(metrics_data, max_points or MAX_RANGE_POINTS),
+                                  resolution, updated_at)
+    # 指标点只追加不修改，范围+分辨率+点数+最后更新时间就能确定内容
+    data_hash = f"{start}|{end}|{resolution}|{max_points}|{len(metrics_data)}|{result['data']['updatedAt']}"
+    return result, data_hash
@@ -1,6 +1,10 @@
-from fastapi import APIRouter, HTTPException
-from app.services.binance_service import BinanceService
-import asyncio
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from app.core.http_cache import check_conditional, make_etag, not_modified
+from app.services.binance_service import pricing_cache
+from app.services.market_data_refresher import market_data_refresher
+from app.services.rate_limiter import request_scheduler
+from app.core.config import settings
+from typing import Any, Dict, List, Optional
 import logging
 
 # 设置日志
@@ -9,91 +13,118 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# 创建全局Binance服务实例以复用连接
-binance_service = BinanceService()
+# 数据最近一次成功刷新的时间，单独作为响应头返回（不参与ETag，304响应也会带上）
+FRESHNESS_HEADER = "X-Data-Updated-At"
+
+
+def parse_symbols(symbols: Optional[str]) -> List[str]:
+    """解析逗号分隔的交易对列表（如 "BTC,ETH"），未指定时使用配置中的默认列表"""
+    if not symbols:
+        return list(settings.PRICING_SYMBOLS)
+    parsed = []
+    for symbol in symbols.split(","):
+        symbol = symbol.strip().upper()
+        if symbol.endswith("/USDT"):
+            symbol = symbol[:-len("/USDT")]
+        if symbol and symbol not in parsed:
+            parsed.append(symbol)
+    return parsed
+
+
+def build_simple_pricing(symbol_list: List[str]) -> Dict[str, Any]:
+    """从内存中组装简化价格数据（/simple接口和推送快照共用）"""
+    pricing = {}
+    
+    # 价格由后台任务定时刷新，这里不会请求交易所；未跟踪的交易对会在下一轮刷新中加入
+    results = market_data_refresher.get_prices(symbol_list)
+    
+    for symbol in symbol_list:
+        result = results[symbol]
+        if "error" in result:
+            pricing[symbol.lower()] = {"current_price": 0, "error": result["error"]}
+        else:
+            pricing[symbol.lower()] = result
+    
+    return {
+        "pricing": pricing,
+        "updatedAt": market_data_refresher.freshness("price_", symbol_list)
+    }
+
 
 @router.get("/simple")
-async def get_simple_pricing():
-    """获取简化的加密货币价格数据（仅当前价格，性能优化版本）"""
+async def get_simple_pricing(
+    request: Request,
+    response: Response,
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols, e.g. BTC,ETH")
+):
+    """获取简化的加密货币价格数据（仅当前价格，直接读取后台刷新的内存数据）"""
     try:
-        symbols = ["BTC", "ETH", "SOL", "BNB", "DOGE"]
-        pricing = {}
-        
-        # 控制并发数量，避免触发API限制
-        semaphore = asyncio.Semaphore(5)  # 增加到5个并发请求
-        
-        async def fetch_with_semaphore(symbol):
-            async with semaphore:
-                return await binance_service.get_current_price(f"{symbol}/USDT")
-        
-        # 并行获取所有符号的价格数据
-        tasks = [
-            fetch_with_semaphore(symbol)
-            for symbol in symbols
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for i, result in enumerate(results):
-            symbol = symbols[i].lower()
-            if isinstance(result, Exception):
-                logger.error(f"Exception fetching {symbols[i]} pricing: {result}")
-                pricing[symbol] = {"current_price": 0, "error": str(result)}
-            elif isinstance(result, dict) and "error" in result:
-                logger.error(f"Error fetching {symbols[i]} pricing: {result['error']}")
-                pricing[symbol] = {"current_price": 0, "error": result["error"]}
-            else:
-                pricing[symbol] = result
-        
+        symbol_list = parse_symbols(symbols)
+        is_not_modified, headers = check_conditional(
+            request,
+            make_etag("simple", market_data_refresher.version("price_", symbol_list)),
+            market_data_refresher.last_changed("price_")
+        )
+        headers[FRESHNESS_HEADER] = market_data_refresher.freshness("price_", symbol_list) or ""
+        if is_not_modified:
+            return not_modified(headers)
+        response.headers.update(headers)
         return {
             "success": True,
-            "data": {
-                "pricing": pricing
-            }
+            "data": build_simple_pricing(symbol_list)
         }
     except Exception as e:
         logger.error(f"Unexpected error in get_simple_pricing: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/")
-async def get_pricing():
-    """获取加密货币价格数据（完整版本，包含技术指标）"""
+async def get_pricing(request: Request, response: Response):
+    """获取加密货币价格数据（完整版本，包含技术指标，直接读取后台刷新的内存数据）"""
     try:
-        symbols = ["BTC", "ETH", "SOL", "BNB", "DOGE"]
+        symbols = list(settings.PRICING_SYMBOLS)
+        is_not_modified, headers = check_conditional(
+            request,
+            make_etag("market_state", market_data_refresher.version("market_state_", symbols)),
+            market_data_refresher.last_changed("market_state_")
+        )
+        headers[FRESHNESS_HEADER] = market_data_refresher.freshness("market_state_", symbols) or ""
+        if is_not_modified:
+            return not_modified(headers)
+        response.headers.update(headers)
         pricing = {}
         
-        # 控制并发数量，避免触发API限制
-        semaphore = asyncio.Semaphore(3)  # 最多同时3个并发请求
-        
-        async def fetch_with_semaphore(symbol):
-            async with semaphore:
-                return await binance_service.get_current_market_state(f"{symbol}/USDT")
+        results = market_data_refresher.get_market_states(symbols)
         
-        # 并行获取所有符号的价格数据
-        tasks = [
-            fetch_with_semaphore(symbol)
-            for symbol in symbols
-        ]
-        
-        results = await asyncio.gather(*tasks, return_exceptions=True)
-        
-        for i, result in enumerate(results):
-            symbol = symbols[i].lower()
-            if isinstance(result, Exception):
-                logger.error(f"Exception fetching {symbols[i]} pricing: {result}")
-                pricing[symbol] = {"current_price": 0, "error": str(result)}
-            elif isinstance(result, dict) and "error" in result:
-                logger.error(f"Error fetching {symbols[i]} pricing: {result['error']}")
-                pricing[symbol] = {"current_price": 0, "error": result["error"]}
+        for symbol in symbols:
+            result = results[symbol]
+            if "error" in result:
+                pricing[symbol.lower()] = {"current_price": 0, "error": result["error"]}
             else:
-                pricing[symbol] = result
+                pricing[symbol.lower()] = result
         
         return {
             "success": True,
             "data": {
-                "pricing": pricing
+                "pricing": pricing,
+                "updatedAt": market_data_refresher.freshness("market_state_", symbols)
             }
         }
     except Exception as e:
         logger.error(f"Unexpected error in get_pricing: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache-stats")
+async def get_cache_stats():
+    """获取价格缓存的命中、未命中和淘汰统计"""
+    return {
+        "success": True,
+        "data": pricing_cache.get_stats()
+    }
+
+@router.get("/rate-limit")
+async def get_rate_limit_usage():
+    """获取交易所请求权重预算的使用情况"""
+    return {
+        "success": True,
+        "data": request_scheduler.get_usage()
+    }
\ No newline at end of file
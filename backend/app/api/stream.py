@@ -0,0 +1,56 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+from app.api import metrics
+from app.api.pricing import build_simple_pricing
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.services.event_hub import event_hub, format_event
+import asyncio
+import logging
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# 没有消息时发送心跳的间隔（秒），避免代理断开空闲连接
+HEARTBEAT_INTERVAL = 15
+
+
+@router.get("/")
+async def stream_updates(request: Request):
+    """Server-Sent Events推送：先发送snapshot（价格和指标），之后只推送增量
+
+    事件类型：snapshot、prices（变化的价格）、metric（新的指标点）、chat（新的聊天记录）、trade（新的交易）
+    """
+    # 先订阅再生成快照，快照期间产生的增量不会丢失
+    subscription = event_hub.subscribe()
+    try:
+        async with AsyncSessionLocal() as db:
+            metrics_result, _ = await db.run_sync(metrics.load_metrics)
+        snapshot = {
+            **build_simple_pricing(list(settings.PRICING_SYMBOLS)),
+            "metrics": metrics_result["data"],
+        }
+    except Exception:
+        event_hub.unsubscribe(subscription)
+        raise
+
+    async def events():
+        try:
+            yield format_event("snapshot", snapshot)
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscription.next(), HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                if message is None:
+                    break
+                yield message
+        finally:
+            event_hub.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
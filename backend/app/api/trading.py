@@ -1,91 +1,240 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, defer
 from sqlalchemy.orm.session import Session
-from app.core.database import get_db
+from sqlalchemy.sql.functions import func
+from app.core.database import get_async_db
+from app.core.http_cache import check_conditional, make_etag, not_modified
+from app.core.pagination import decode_cursor, keyset_page
 from app.models.trading import Chat, Trading
 import json
 import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
+def parse_chat_decision(content: Optional[str]) -> Any:
+    """解析AI返回的决策内容，不是有效的JSON时保留原始内容"""
+    try:
+        return json.loads(content) if content else {}
+    except json.JSONDecodeError:
+        return {"content": content}
+
+
+def chat_decision_columns(content: Optional[str]) -> Dict[str, Any]:
+    """写入聊天记录时预先解析决策，得到decision/recommendation/risk_level列的值"""
+    decision = parse_chat_decision(content)
+    fields = decision if isinstance(decision, dict) else {}
+    recommendation = fields.get("recommendation")
+    risk_level = fields.get("risk_level")
+    return {
+        "decision": decision,
+        "recommendation": str(recommendation).upper() if recommendation else None,
+        "risk_level": str(risk_level).upper() if risk_level else None,
+    }
+
+
+def _chat_decision(chat: Chat) -> Any:
+    # 旧记录没有预解析的decision时才解析原始内容
+    return chat.decision if chat.decision is not None else parse_chat_decision(chat.chat)
+
+
+def _format_time(value: Any) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+_CHAT_FIELD_GETTERS: Dict[str, Callable[[Chat], Any]] = {
+    "id": lambda chat: chat.id,
+    "model": lambda chat: chat.model,
+    "chat": _chat_decision,
+    "recommendation": lambda chat: chat.recommendation,
+    "risk_level": lambda chat: chat.risk_level,
+    "reasoning": lambda chat: chat.reasoning,
+    "user_prompt": lambda chat: chat.user_prompt,
+    "created_at": lambda chat: _format_time(chat.created_at),
+    "updated_at": lambda chat: _format_time(chat.updated_at),
+}
+
+# 列表接口默认返回的字段：不包含完整的提示词（通过 /chats/{id} 单独获取）
+CHAT_LIST_FIELDS = ("id", "model", "chat", "recommendation", "risk_level", "reasoning", "created_at", "updated_at")
+CHAT_DETAIL_FIELDS = tuple(_CHAT_FIELD_GETTERS)
+
+
+def serialize_chat(chat: Chat, fields: Sequence[str] = CHAT_LIST_FIELDS) -> Dict[str, Any]:
+    """聊天记录的返回格式（列表接口和推送共用），只序列化请求的字段"""
+    return {field: _CHAT_FIELD_GETTERS[field](chat) for field in fields}
+
+
+def serialize_trade(trade: Trading) -> Dict[str, Any]:
+    """交易记录的返回格式（列表接口和推送共用）"""
+    return {
+        "id": trade.id,
+        "symbol": trade.symbol,
+        "operation": trade.operation,
+        "leverage": trade.leverage,
+        "amount": trade.amount,
+        "pricing": trade.pricing,
+        "stop_loss": trade.stop_loss,
+        "take_profit": trade.take_profit,
+        "created_at": trade.created_at.isoformat() if trade.created_at else None,
+        "chat_id": trade.chat_id,
+        "chat_model": trade.chat.model if trade.chat else None,
+        "chat_created_at": trade.chat.created_at.isoformat() if trade.chat and trade.chat.created_at else None
+    }
+
+
+def completed_trades_query(db: Session):
+    """交易记录查询：JOIN聊天记录并直接填充trade.chat（仅model和created_at），避免逐行懒加载"""
+    return db.query(Trading).join(Trading.chat).options(
+        contains_eager(Trading.chat).load_only(Chat.model, Chat.created_at)
+    )
+
+
+# 以下查询函数使用同步Session，异步接口通过 AsyncSession.run_sync 在驱动的异步连接上执行，
+# 序列化（包括提示词的还原）也在其中完成，不会在事件循环中触发懒加载
+
+def list_chats(db: Session, cursor: Optional[Tuple[Any, str]], limit: int, skip: int,
+               fields: Sequence[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """查询并序列化一页聊天记录，按(创建时间, id)倒序排列，走组合索引；不需要时不读取提示词"""
+    query = db.query(Chat)
+    if "user_prompt" not in fields:
+        query = query.options(defer(Chat.user_prompt_stored))
+    chats, next_cursor = keyset_page(query, Chat.created_at, Chat.id, cursor, limit, skip)
+    return [serialize_chat(chat, fields) for chat in chats], next_cursor
+
+
+def load_chat_detail(db: Session, chat_id: str) -> Optional[Dict[str, Any]]:
+    """单条聊天记录的完整内容，不存在时返回None"""
+    chat = db.query(Chat).filter(Chat.id == chat_id).first()
+    return serialize_chat(chat, CHAT_DETAIL_FIELDS) if chat is not None else None
+
+
+def list_completed_trades(db: Session, cursor: Optional[Tuple[Any, str]], limit: int,
+                          skip: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """查询并序列化一页交易记录，关联的聊天记录在同一条语句中只加载需要的列"""
+    trades, next_cursor = keyset_page(completed_trades_query(db), Trading.created_at, Trading.id,
+                                      cursor, limit, skip)
+    return [serialize_trade(trade) for trade in trades], next_cursor
+
+
+async def list_version(db: AsyncSession, updated_at_column: Any) -> Tuple[Any, int]:
+    """列表数据的版本：(最近更新时间, 该时间的记录数)，两次查询都走updated_at索引，不随表大小变慢
+
+    SQLite的server_default时间只精确到秒，同一秒内新增的记录不会改变max(updated_at)，但会改变该时间的记录数。
+    记录只追加不删除，所以版本不变就说明数据不变。时间精度不够，列表接口不使用Last-Modified。
+    """
+    # 在同一条语句中比较，避免最大值回传绑定时的格式差异
+    last_updated = select(func.max(updated_at_column)).scalar_subquery()
+    count = select(func.count()).select_from(updated_at_column.table) \
+        .where(updated_at_column == last_updated).scalar_subquery()
+    return tuple((await db.execute(select(last_updated, count))).one())
+
+
+def parse_chat_fields(fields: Optional[str]) -> Sequence[str]:
+    """解析fields参数（逗号分隔），未知字段返回400"""
+    if not fields:
+        return CHAT_LIST_FIELDS
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in _CHAT_FIELD_GETTERS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    return selected
+
+
+def parse_before(before: Optional[str]) -> Optional[Tuple[Any, str]]:
+    """解析before游标参数，格式错误时返回400"""
+    if not before:
+        return None
+    try:
+        return decode_cursor(before)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {before}")
+
+
 @router.get("/chats")
 async def get_chats(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    before: Optional[str] = Query(None, description="分页游标：上一页返回的next_cursor（<created_at>,<id>）"),
+    fields: Optional[str] = Query(None, description="返回的字段（逗号分隔），默认不包含user_prompt"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取聊天记录"""
+    """获取聊天记录列表，支持字段选择、before游标分页和ETag条件请求"""
+    cursor = parse_before(before)
+    selected_fields = parse_chat_fields(fields)
     try:
-        # 查询聊天记录，按创建时间倒序排列
-        chats = db.query(Chat).order_by(Chat.created_at.desc()).offset(skip).limit(limit).all()
+        # 用数据版本判断数据是否变化，未变化时不查询和序列化聊天内容
+        version = await list_version(db, Chat.updated_at)
+        is_not_modified, headers = check_conditional(
+            request, make_etag("chats", *version, skip, limit, before, ",".join(selected_fields))
+        )
+        if is_not_modified:
+            return not_modified(headers)
+        response.headers.update(headers)
         
-        # 格式化返回数据
-        chat_list = []
-        for chat in chats:
-            try:
-                # 尝试解析chat内容为JSON
-                chat_content = json.loads(chat.chat) if chat.chat else {}
-            except json.JSONDecodeError:
-                # 如果不是有效的JSON，直接使用原始内容
-                chat_content = {"content": chat.chat}
-            
-            chat_list.append({
-                "id": chat.id,
-                "model": chat.model,
-                "chat": chat_content,
-                "reasoning": chat.reasoning,
-                "user_prompt": chat.user_prompt,
-                "created_at": chat.created_at.isoformat() if chat.created_at else None,
-                "updated_at": chat.updated_at.isoformat() if chat.updated_at else None
-            })
+        chat_list, next_cursor = await db.run_sync(list_chats, cursor, limit, skip, selected_fields)
         
         return {
             "success": True,
             "data": chat_list,
             "total": len(chat_list),
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/chats/{chat_id}")
+async def get_chat(chat_id: str, db: AsyncSession = Depends(get_async_db)):
+    """获取单条聊天记录的完整内容（包括提示词）"""
+    try:
+        chat_data = await db.run_sync(load_chat_detail, chat_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if chat_data is None:
+        raise HTTPException(status_code=404, detail="Chat not found")
+    return {
+        "success": True,
+        "data": chat_data
+    }
+
+
 @router.get("/completed-trades")
 async def get_completed_trades(
+    request: Request,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    before: Optional[str] = Query(None, description="分页游标：上一页返回的next_cursor（<created_at>,<id>）"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """获取已完成的交易记录"""
+    """获取已完成的交易记录，支持before游标分页和ETag条件请求"""
+    cursor = parse_before(before)
     try:
-        # 查询交易记录，按创建时间倒序排列，关联聊天记录
-        trades = db.query(Trading).join(Chat).order_by(Trading.created_at.desc()).offset(skip).limit(limit).all()
+        version = await list_version(db, Trading.updated_at)
+        is_not_modified, headers = check_conditional(
+            request, make_etag("completed-trades", *version, skip, limit, before)
+        )
+        if is_not_modified:
+            return not_modified(headers)
+        response.headers.update(headers)
         
-        # 格式化返回数据
-        trade_list = []
-        for trade in trades:
-            trade_list.append({
-                "id": trade.id,
-                "symbol": trade.symbol,
-                "operation": trade.operation,
-                "leverage": trade.leverage,
-                "amount": trade.amount,
-                "pricing": trade.pricing,
-                "stop_loss": trade.stop_loss,
-                "take_profit": trade.take_profit,
-                "created_at": trade.created_at.isoformat() if trade.created_at else None,
-                "chat_id": trade.chat_id,
-                "chat_model": trade.chat.model if trade.chat else None,
-                "chat_created_at": trade.chat.created_at.isoformat() if trade.chat and trade.chat.created_at else None
-            })
+        trade_list, next_cursor = await db.run_sync(list_completed_trades, cursor, limit, skip)
         
         return {
             "success": True,
             "data": trade_list,
             "total": len(trade_list),
             "skip": skip,
-            "limit": limit
+            "limit": limit,
+            "next_cursor": next_cursor
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
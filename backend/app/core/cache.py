@@ -0,0 +1,155 @@
+import asyncio
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CacheNamespace:
+    """一组以相同前缀开头的缓存项的过期策略"""
+
+    def __init__(self, ttl: float, stale_ttl: float = 0):
+        self.ttl = ttl  # 新鲜期（秒）
+        self.stale_ttl = stale_ttl  # 过期后仍可返回旧值并后台刷新的时长（秒），0表示不启用
+
+
+class LRUCache:
+    """O(1) LRU缓存，支持按前缀划分的TTL、stale-while-revalidate和并发请求合并"""
+
+    def __init__(self, ttl: float = 60, maxsize: int = 100, stale_ttl: float = 0,
+                 namespaces: Optional[Dict[str, CacheNamespace]] = None):
+        # {key: (value, fresh_until, stale_until)}，按访问顺序排列，最久未访问的在最前
+        self.cache: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self.maxsize = maxsize
+        self.default = CacheNamespace(ttl, stale_ttl)
+        self.namespaces: Dict[str, CacheNamespace] = dict(namespaces or {})
+        self._inflight: Dict[str, asyncio.Task] = {}  # 进行中的请求，用于合并并发的缓存未命中
+        self._refreshing: Set[asyncio.Task] = set()  # 后台刷新任务，保留引用避免被回收
+        self.stats: Dict[str, int] = {
+            "hits": 0,  # 命中新鲜值
+            "stale_hits": 0,  # 返回旧值并触发后台刷新
+            "misses": 0,
+            "evictions": 0,  # 因容量上限被淘汰
+            "expirations": 0,  # 因过期被删除
+            "fetches": 0,  # 实际发起的请求次数
+            "coalesced": 0,  # 被合并到进行中请求的调用次数
+            "refresh_errors": 0,  # 后台刷新失败次数
+        }
+
+    def namespace(self, key: str) -> CacheNamespace:
+        """按最长前缀匹配key所属的命名空间"""
+        best_prefix = None
+        for prefix in self.namespaces:
+            if key.startswith(prefix) and (best_prefix is None or len(prefix) > len(best_prefix)):
+                best_prefix = prefix
+        return self.namespaces[best_prefix] if best_prefix is not None else self.default
+
+    def lookup(self, key: str) -> Tuple[Optional[Any], bool]:
+        """返回(value, is_fresh)；超过旧值期限或不存在时返回(None, False)"""
+        entry = self.cache.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None, False
+        value, fresh_until, stale_until = entry
+        now = time.time()
+        if now >= stale_until:
+            del self.cache[key]
+            self.stats["expirations"] += 1
+            self.stats["misses"] += 1
+            return None, False
+        self.cache.move_to_end(key)
+        if now < fresh_until:
+            self.stats["hits"] += 1
+            return value, True
+        self.stats["stale_hits"] += 1
+        return value, False
+
+    def get(self, key: str) -> Optional[Any]:
+        """只返回新鲜值"""
+        value, fresh = self.lookup(key)
+        return value if fresh else None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        namespace = self.namespace(key)
+        fresh_until = time.time() + (namespace.ttl if ttl is None else ttl)
+        self.cache[key] = (value, fresh_until, fresh_until + namespace.stale_ttl)
+        self.cache.move_to_end(key)
+        # 超过容量时淘汰最久未访问的项
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def invalidate(self, prefix: str) -> int:
+        """删除所有以prefix开头的缓存项"""
+        keys = [key for key in self.cache if key.startswith(prefix)]
+        for key in keys:
+            del self.cache[key]
+        return len(keys)
+
+    async def coalesce(self, key: str, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        """同一个key同时只允许一个进行中的请求，其余调用者等待它的结果（异常也会传给所有等待者）
+
+        请求在独立的任务中执行，不属于任何调用者：某个调用者被取消只会停止它自己的等待，
+        其他调用者仍然得到请求的结果或真实的异常。
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            task = asyncio.get_event_loop().create_task(fetcher())
+            self._inflight[key] = task
+            self.stats["fetches"] += 1
+            task.add_done_callback(lambda done: self._finish_inflight(key, done))
+        return await asyncio.shield(task)
+
+    def _finish_inflight(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 没有等待者时也要取走异常，避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    async def get_or_fetch(self, key: str, fetcher: Callable[[], Awaitable[Any]]) -> Any:
+        """读取缓存；新鲜值直接返回，旧值立即返回并在后台刷新，否则等待请求结果"""
+        value, fresh = self.lookup(key)
+        if value is not None:
+            if not fresh:
+                self.refresh(key, self._fetch_and_store(key, fetcher))
+            return value
+
+        return await self.coalesce(key, self._fetch_and_store(key, fetcher))
+
+    def refresh(self, key: str, fetcher: Callable[[], Awaitable[Any]]) -> None:
+        """在后台执行fetcher（同一个key已有进行中的请求时不重复发起），失败时保留旧值"""
+        if key in self._inflight:
+            return
+
+        async def run_refresh():
+            try:
+                await self.coalesce(key, fetcher)
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                logger.warning(f"Background refresh of {key} failed: {e}")
+
+        task = asyncio.get_event_loop().create_task(run_refresh())
+        self._refreshing.add(task)
+        task.add_done_callback(self._refreshing.discard)
+
+    def _fetch_and_store(self, key: str, fetcher: Callable[[], Awaitable[Any]]) -> Callable[[], Awaitable[Any]]:
+        async def fetch_and_store():
+            result = await fetcher()
+            self.set(key, result)
+            return result
+        return fetch_and_store
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中/未命中/淘汰统计"""
+        lookups = self.stats["hits"] + self.stats["stale_hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self.cache),
+            "maxsize": self.maxsize,
+            "hit_rate": (self.stats["hits"] + self.stats["stale_hits"]) / lookups if lookups else 0,
+        }
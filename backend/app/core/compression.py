@@ -0,0 +1,130 @@
+import hashlib
+import json
+import zlib
+from sqlalchemy.types import Text, TypeDecorator
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# 短于这个长度的文本不压缩（压缩后反而可能更长）
+MIN_COMPRESS_SIZE = 256
+# 序列化后不短于这个长度的子文档单独存储并按内容去重
+MIN_BLOB_SIZE = 512
+# 只拆分前两层（例如 market_state -> long_term_context），更深的结构整体存储
+MAX_SPLIT_DEPTH = 2
+# 清单的标记以及清单中引用子文档的标记
+MANIFEST_KEY = "$manifest"
+BLOB_REF_KEY = "$blob"
+# 以此开头的存储值都按清单解析
+MANIFEST_PREFIX = '{"' + MANIFEST_KEY + '"'
+
+
+def compress_text(text: str) -> bytes:
+    return zlib.compress(text.encode("utf-8"), 6)
+
+
+def decompress_text(data: bytes) -> str:
+    return zlib.decompress(data).decode("utf-8")
+
+
+class CompressedText(TypeDecorator):
+    """透明压缩的文本列：较长的文本以zlib压缩后的BLOB存储，读取时自动解压
+
+    SQLite的TEXT列可以直接存放BLOB，所以旧的未压缩行无需迁移也能正常读取。
+    其他数据库的TEXT列不接受二进制数据，不压缩，按普通文本存储。
+    """
+
+    impl = Text
+    cache_ok = True
+
+    def process_bind_param(self, value: Optional[str], dialect) -> Any:
+        if value is None or len(value) < MIN_COMPRESS_SIZE or dialect.name != "sqlite":
+            return value
+        return compress_text(value)
+
+    def process_result_value(self, value: Any, dialect) -> Optional[str]:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return decompress_text(bytes(value))
+        return value
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _externalize(value: Any, depth: int, blobs: Dict[str, str]) -> Any:
+    if depth >= MAX_SPLIT_DEPTH or not isinstance(value, dict):
+        return value
+    result = {}
+    for key, child in value.items():
+        if isinstance(child, (dict, list)):
+            child = _externalize(child, depth + 1, blobs)
+            text = json.dumps(child)
+            if len(text) >= MIN_BLOB_SIZE:
+                digest = content_hash(text)
+                blobs[digest] = text
+                child = {BLOB_REF_KEY: digest}
+        result[key] = child
+    return result
+
+
+def _unsplit(text: str) -> str:
+    # 原文恰好以清单标记开头时整体包装为字符串清单，避免读取时被当作清单解析
+    return json.dumps({MANIFEST_KEY: text}) if text.startswith(MANIFEST_PREFIX) else text
+
+
+def split_document(text: str) -> Tuple[str, Dict[str, str]]:
+    """把JSON文档中较大的子文档替换为内容哈希引用，返回(清单, {哈希: 子文档})
+
+    只处理能按json.dumps默认格式无损还原的JSON对象，其他文本原样返回。
+    """
+    try:
+        document = json.loads(text)
+    except (TypeError, ValueError):
+        return _unsplit(text), {}
+    if not isinstance(document, dict) or json.dumps(document) != text:
+        return _unsplit(text), {}
+    blobs: Dict[str, str] = {}
+    manifest = _externalize(document, 0, blobs)
+    if not blobs:
+        return _unsplit(text), {}
+    return json.dumps({MANIFEST_KEY: manifest}), blobs
+
+
+def _collect_refs(value: Any, refs: set) -> None:
+    if isinstance(value, dict):
+        if set(value) == {BLOB_REF_KEY}:
+            refs.add(value[BLOB_REF_KEY])
+        else:
+            for child in value.values():
+                _collect_refs(child, refs)
+
+
+def _resolve_refs(value: Any, blobs: Dict[str, Any]) -> Any:
+    if isinstance(value, dict):
+        if set(value) == {BLOB_REF_KEY}:
+            # 子文档中也可能包含引用
+            return _resolve_refs(blobs[value[BLOB_REF_KEY]], blobs)
+        return {key: _resolve_refs(child, blobs) for key, child in value.items()}
+    return value
+
+
+def join_document(stored: Optional[str], fetch_blobs: Callable[[Iterable[str]], Dict[str, str]]) -> Optional[str]:
+    """由清单和子文档还原完整文本，fetch_blobs按哈希批量读取子文档（每层一次）"""
+    if not stored or not stored.startswith(MANIFEST_PREFIX):
+        return stored
+    document = json.loads(stored)[MANIFEST_KEY]
+    if isinstance(document, str):
+        return document
+    loaded: Dict[str, Any] = {}
+    pending = set()
+    _collect_refs(document, pending)
+    while pending:
+        fetched = fetch_blobs(pending)
+        missing = pending - set(fetched)
+        if missing:
+            raise ValueError(f"Missing content blobs: {sorted(missing)}")
+        pending = set()
+        for digest, text in fetched.items():
+            loaded[digest] = json.loads(text)
+            _collect_refs(loaded[digest], pending)
+        pending -= set(loaded)
+    return json.dumps(_resolve_refs(document, loaded))
@@ -5,11 +5,33 @@ from typing import Optional
 class Settings(BaseSettings):
     PROJECT_NAME: str = "crypto-ai"
     DATABASE_URL: str = "sqlite:///./crypto.db"
+    # SQLite连接参数：内存映射大小（字节）、页缓存（负数表示KB）、写锁等待时间（毫秒）
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024
+    SQLITE_CACHE_SIZE: int = -64000
+    SQLITE_BUSY_TIMEOUT: int = 5000
+    # 连接池大小（SQLite文件数据库）
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
     BINANCE_API_KEY: str
     BINANCE_API_SECRET: str
     DEEPSEEK_API_KEY: str
     CRON_SECRET_KEY: str
     START_MONEY: float = 29
+    # 价格接口默认返回的交易对（USDT计价）
+    PRICING_SYMBOLS: list = ["BTC", "ETH", "SOL", "BNB", "DOGE"]
+    # 交易所市场元数据的本地缓存文件
+    MARKETS_CACHE_FILE: str = "./markets_cache.json"
+    # 账户指标点的保留天数，更早的点在采集时删除
+    METRICS_RETENTION_DAYS: int = 90
+    # 指标聚合层级的保留天数（1d层级永久保留）
+    METRICS_ROLLUP_5M_RETENTION_DAYS: int = 365
+    METRICS_ROLLUP_1H_RETENTION_DAYS: int = 1825
+    # 进程内调度器：交易决策和指标采集的执行间隔（秒）及随机抖动
+    # 默认关闭以兼容已安装crontab的部署；启用前需先移除crontab，否则任务会重复执行（可能重复下单）
+    SCHEDULER_ENABLED: bool = False
+    DECISION_INTERVAL_SECONDS: int = 180
+    METRICS_INTERVAL_SECONDS: int = 20
+    SCHEDULER_JITTER_SECONDS: int = 0
     # 更新CORS设置以允许来自前端开发服务器的请求
     BACKEND_CORS_ORIGINS: list = [
         "http://localhost:5173",  # 本地开发地址
@@ -1,21 +1,95 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
 from app.core.config import settings
-from typing import TYPE_CHECKING, Generator
+from typing import TYPE_CHECKING, AsyncGenerator, Generator
 
 if TYPE_CHECKING:
     from sqlalchemy.sql.schema import MetaData
 
-# 修改引擎配置以支持线程安全
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    pool_pre_ping=True,
-    pool_recycle=300
-)
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """每个新连接建立时设置SQLite参数：WAL模式下读不阻塞写、写不阻塞读"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    # WAL模式下NORMAL只在检查点时fsync，进程崩溃不会损坏数据库
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA mmap_size={settings.SQLITE_MMAP_SIZE}")
+    cursor.execute(f"PRAGMA cache_size={settings.SQLITE_CACHE_SIZE}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT}")
+    cursor.close()
+
+
+def _is_sqlite_file(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database not in (None, "", ":memory:")
+
+
+def create_database_engine(url: str) -> Engine:
+    """SQLite文件数据库使用本地文件的配置（连接池复用连接，不做ping和定时回收），其他数据库保持原配置"""
+    if _is_sqlite_file(url):
+        sqlite_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT / 1000},
+            poolclass=QueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        )
+        event.listen(sqlite_engine, "connect", apply_sqlite_pragmas)
+        return sqlite_engine
+    # 修改引擎配置以支持线程安全
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_pre_ping=True,
+        pool_recycle=300
+    )
+
+
+# 各数据库对应的异步驱动
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def to_async_url(url: str) -> str:
+    """把同步连接地址换成对应的异步驱动（例如 postgresql+psycopg2 -> postgresql+asyncpg）"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for database backend: {backend}")
+    return str(parsed.set(drivername=ASYNC_DRIVERS[backend]))
+
+
+def create_async_database_engine(url: str) -> AsyncEngine:
+    """异步引擎（SQLite使用aiosqlite，PostgreSQL使用asyncpg），与同步引擎使用相同的SQLite参数"""
+    url = to_async_url(url)
+    if _is_sqlite_file(url):
+        async_engine = create_async_engine(
+            url,
+            connect_args={"timeout": settings.SQLITE_BUSY_TIMEOUT / 1000},
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        )
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+        return async_engine
+    return create_async_engine(url, pool_pre_ping=True, pool_recycle=300)
+
+
+engine = create_database_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步会话：提交后不过期对象，避免在事件循环中触发懒加载
+async_engine = create_async_database_engine(settings.DATABASE_URL)
+AsyncSessionLocal = sessionmaker(
+    async_engine, class_=AsyncSession, autocommit=False, autoflush=False, expire_on_commit=False
+)
+
 Base = declarative_base()
 
 def get_db() -> Generator[Session, None, None]:
@@ -23,4 +97,9 @@ def get_db() -> Generator[Session, None, None]:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
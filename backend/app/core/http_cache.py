@@ -0,0 +1,63 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from typing import Any, Dict, Optional, Tuple
+
+
+def make_etag(*parts: Any) -> str:
+    """由版本号、内容哈希等组成弱ETag"""
+    digest = hashlib.md5("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # 数据库中的无时区时间按UTC处理
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # If-None-Match使用弱比较，忽略W/前缀
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def check_conditional(request: Request, etag: str,
+                      last_modified: Optional[datetime] = None) -> Tuple[bool, Dict[str, str]]:
+    """检查条件请求头，返回(是否未修改, 需要附加到响应上的缓存头)
+
+    有If-None-Match时只比较ETag，否则才使用If-Modified-Since。
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified).replace(microsecond=0)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag), headers
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = _as_utc(parsedate_to_datetime(if_modified_since))
+        except (TypeError, ValueError):
+            return False, headers
+        return last_modified <= since, headers
+
+    return False, headers
+
+
+def not_modified(headers: Dict[str, str]) -> Response:
+    """不带响应体的304响应"""
+    return Response(status_code=304, headers=headers)
@@ -0,0 +1,59 @@
+from datetime import datetime
+from sqlalchemy import String, and_, literal, or_
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.schema import Column
+from typing import Any, List, Optional, Tuple
+
+
+def encode_cursor(created_at: Optional[datetime], row_id: str) -> str:
+    """游标格式：<created_at>,<id>，指向当前页的最后一条记录"""
+    return f"{created_at.isoformat() if created_at else ''},{row_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """解析游标，格式不正确时抛出ValueError"""
+    created_at, sep, row_id = cursor.partition(",")
+    if not sep or not row_id:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return datetime.fromisoformat(created_at), row_id
+
+
+def _created_at_bounds(query: Query, created_at: datetime) -> Tuple[Any, Any]:
+    """同一时间在数据库中可能的最小和最大存储值
+
+    SQLite按文本比较时间：server_default写入的时间没有微秒（"YYYY-MM-DD HH:MM:SS"），
+    SQLAlchemy写入的时间总带6位微秒，所以微秒为0的时间有两种存储形式。
+    """
+    if query.session.get_bind().dialect.name == "sqlite":
+        text = created_at.strftime("%Y-%m-%d %H:%M:%S")
+        with_microseconds = literal(f"{text}.{created_at.microsecond:06d}", String)
+        if created_at.microsecond:
+            return with_microseconds, with_microseconds
+        return literal(text, String), with_microseconds
+    return created_at, created_at
+
+
+def keyset_page(query: Query, created_at_column: Column, id_column: Column,
+                before: Optional[Tuple[datetime, str]], limit: int, skip: int = 0) -> Tuple[List[Any], Optional[str]]:
+    """按(created_at, id)倒序的游标分页，返回(当前页记录, 下一页游标)
+
+    before为解析后的上一页游标；不传时从最新的记录开始（兼容旧的skip参数）。
+    需要(created_at, id)上的组合索引，翻页深度不影响查询耗时。
+    """
+    if before:
+        created_at, row_id = before
+        lowest, highest = _created_at_bounds(query, created_at)
+        # 等价于 (created_at, id) < (游标时间, 游标id)，同一时间的两种存储形式都视为相等
+        query = query.filter(and_(
+            created_at_column <= highest,
+            or_(created_at_column < lowest, id_column < row_id)
+        ))
+    query = query.order_by(created_at_column.desc(), id_column.desc())
+    if skip and not before:
+        query = query.offset(skip)
+    rows = query.limit(limit).all()
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_at_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -1,8 +1,13 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import cron, metrics, pricing, trading
+from app.api import cron, metrics, pricing, stream, trading
+from app.api.deps import get_binance_service
 from app.core.config import settings
 from app.core.database import Base, engine
+from app.services.exchange import close_exchange
+from app.services.market_data_refresher import market_data_refresher
+from app.services.markets import market_metadata
+from app.services.scheduler import job_scheduler
 import uvicorn
 import logging
 from typing import TYPE_CHECKING
@@ -18,6 +23,7 @@ logger = logging.getLogger(__name__)
 try:
     # 使用类型转换来解决Pyright类型检查问题
     metadata = Base.metadata  # type: ignore
+    # 只创建缺失的表；已有表的新增列和索引由 migrate_schema.py 补上
     metadata.create_all(bind=engine)
     logger.info("Database tables created successfully")
 except Exception as e:
@@ -32,6 +38,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pricing.FRESHNESS_HEADER],
 )
 
 # 包含路由
@@ -39,6 +46,7 @@ app.include_router(cron.router, prefix="/api/cron", tags=["cron"])
 app.include_router(metrics.router, prefix="/api/metrics", tags=["metrics"])
 app.include_router(pricing.router, prefix="/api/pricing", tags=["pricing"])
 app.include_router(trading.router, prefix="/api/trading", tags=["trading"])
+app.include_router(stream.router, prefix="/api/stream", tags=["stream"])
 
 @app.get("/")
 async def root():
@@ -48,10 +56,26 @@ async def root():
 @app.on_event("startup")
 async def startup_event():
     logger.info("Application startup")
+    # 市场元数据只加载一次（优先读取本地文件），之后低频刷新
+    market_metadata.start()
+    # 后台定时刷新价格和市场状态，价格接口只读取内存
+    market_data_refresher.start(get_binance_service())
+    # 交易决策和指标采集由进程内调度器直接执行
+    if settings.SCHEDULER_ENABLED:
+        job_scheduler.add_job("trading_decision", cron.scheduled_trading_decision,
+                              settings.DECISION_INTERVAL_SECONDS, settings.SCHEDULER_JITTER_SECONDS)
+        job_scheduler.add_job("metrics_collection", cron.scheduled_metrics_collection,
+                              settings.METRICS_INTERVAL_SECONDS, settings.SCHEDULER_JITTER_SECONDS)
+        job_scheduler.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info("Application shutdown")
+    job_scheduler.stop()
+    await market_data_refresher.stop()
+    await market_metadata.stop()
+    # 关闭共享交易所客户端的HTTP会话
+    await close_exchange()
 
 if __name__ == "__main__":
     try:
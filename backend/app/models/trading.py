@@ -1,8 +1,12 @@
-from sqlalchemy.sql.schema import Column, ForeignKey
+from sqlalchemy.sql.schema import Column, ForeignKey, Index
 from sqlalchemy.sql.functions import func
-from sqlalchemy.orm import relationship
-from sqlalchemy.types import Integer, String, DateTime, Text, JSON
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session, relationship, synonym
+from sqlalchemy.orm.exc import DetachedInstanceError
+from sqlalchemy.types import Integer, BigInteger, Float, String, DateTime, Text, JSON
 import uuid
+from typing import Dict, Iterable, Optional
+from app.core.compression import CompressedText, join_document, split_document
 from app.core.database import Base
 
 
@@ -17,19 +21,131 @@ class Metrics(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
 
+class MetricPoint(Base):
+    """账户指标时间序列，每次采集追加一行"""
+    __tablename__ = "metric_points"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    model = Column(String, nullable=False, default="Deepseek")
+    created_at = Column(DateTime, nullable=False)
+    total_cash_value = Column(Float, nullable=False, default=0)
+    current_total_return = Column(Float, nullable=False, default=0)
+    available_cash = Column(Float, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_metric_points_model_created_at", "model", "created_at"),
+    )
+
+
+class MetricRollup(Base):
+    """账户指标的聚合层级（5m/1h/1d），每个时间桶一行，随指标点增量更新"""
+    __tablename__ = "metric_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    model = Column(String, nullable=False, default="Deepseek")
+    resolution = Column(String, nullable=False)
+    bucket_start = Column(DateTime, nullable=False)
+    # 总资产的OHLC
+    open_value = Column(Float, nullable=False, default=0)
+    high_value = Column(Float, nullable=False, default=0)
+    low_value = Column(Float, nullable=False, default=0)
+    close_value = Column(Float, nullable=False, default=0)
+    # 收益率的最小/最大/最新值
+    min_return = Column(Float, nullable=False, default=0)
+    max_return = Column(Float, nullable=False, default=0)
+    close_return = Column(Float, nullable=False, default=0)
+    available_cash = Column(Float, nullable=False, default=0)
+    point_count = Column(Integer, nullable=False, default=0)
+    # 桶内最后一个指标点的时间
+    last_point_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_metric_rollups_model_resolution_bucket", "model", "resolution", "bucket_start", unique=True),
+    )
+
+
 class Chat(Base):
     __tablename__ = "chats"
 
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     model = Column(String, default="Deepseek")
-    chat = Column(Text, default="<no chat>")
+    chat = Column(CompressedText, default="<no chat>")
     reasoning = Column(Text, nullable=False)
-    user_prompt = Column(Text, nullable=False)
+    # 存储的是压缩后的清单，较大的子文档按内容哈希存放在content_blobs中；通过user_prompt读写完整文本
+    user_prompt_stored = Column("user_prompt", CompressedText, nullable=False)
+    # 写入时从chat解析出的决策，列表接口直接使用，不再逐行json.loads
+    decision = Column(JSON, nullable=True)
+    recommendation = Column(String, nullable=True)
+    risk_level = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     tradings = relationship("Trading", back_populates="chat")
 
+    __table_args__ = (
+        Index("ix_chats_created_at_id", "created_at", "id"),
+        # 列表接口的ETag只取max(updated_at)，走索引而不扫描全表
+        Index("ix_chats_updated_at", "updated_at"),
+    )
+
+    def _get_user_prompt(self) -> Optional[str]:
+        pending = self.__dict__.get("_user_prompt_text")
+        if pending is not None:
+            return pending
+        session = object_session(self)
+        if session is None:
+            return join_document(self.user_prompt_stored, self._detached_blobs)
+        return join_document(self.user_prompt_stored, lambda hashes: load_blobs(session, hashes))
+
+    def _detached_blobs(self, hashes: Iterable[str]) -> Dict[str, str]:
+        # 拆分存储的提示词需要通过会话读取子文档
+        raise DetachedInstanceError(
+            f"Chat {self.id} is not bound to a Session; user_prompt cannot load its content blobs"
+        )
+
+    def _set_user_prompt(self, value: str) -> None:
+        # 完整文本先保存在实例上，flush前再拆分出子文档（见 _store_chat_prompts）
+        self.__dict__["_user_prompt_text"] = value
+        self.user_prompt_stored = value
+
+    user_prompt = synonym("user_prompt_stored", descriptor=property(_get_user_prompt, _set_user_prompt))
+
+
+class ContentBlob(Base):
+    """按内容寻址的压缩子文档（例如未变化的持仓列表、4小时指标序列），相同内容只存一份"""
+    __tablename__ = "content_blobs"
+
+    hash = Column(String, primary_key=True)  # 未压缩文本的sha256
+    data = Column(CompressedText, nullable=False)
+    size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+def load_blobs(session: Session, hashes: Iterable[str]) -> Dict[str, str]:
+    """按哈希批量读取子文档"""
+    rows = session.query(ContentBlob.hash, ContentBlob.data).filter(ContentBlob.hash.in_(list(hashes))).all()
+    return {digest: data for digest, data in rows}
+
+
+@event.listens_for(Session, "before_flush")
+def _store_chat_prompts(session: Session, flush_context, instances) -> None:
+    """写入聊天记录前把提示词拆分为清单和子文档，子文档已存在时不重复写入"""
+    added = set()
+    for chat in list(session.new) + list(session.dirty):
+        if not isinstance(chat, Chat):
+            continue
+        text = chat.__dict__.pop("_user_prompt_text", None)
+        if text is None:
+            continue
+        manifest, blobs = split_document(text)
+        if blobs:
+            existing = set(load_blobs(session, blobs)) | added
+            for digest, blob in blobs.items():
+                if digest not in existing:
+                    session.add(ContentBlob(hash=digest, data=blob, size=len(blob)))
+                    added.add(digest)
+        chat.user_prompt_stored = manifest
+
 
 class Trading(Base):
     __tablename__ = "tradings"
@@ -46,4 +162,22 @@ class Trading(Base):
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     chat_id = Column(String, ForeignKey("chats.id", ondelete="CASCADE"))
-    chat = relationship("Chat", back_populates="tradings")
\ No newline at end of file
+    chat = relationship("Chat", back_populates="tradings")
+
+    __table_args__ = (
+        Index("ix_tradings_created_at_id", "created_at", "id"),
+        Index("ix_tradings_updated_at", "updated_at"),
+    )
+
+
+class Candle(Base):
+    __tablename__ = "candles"
+
+    symbol = Column(String, primary_key=True)
+    timeframe = Column(String, primary_key=True)
+    open_time = Column(BigInteger, primary_key=True)  # 毫秒时间戳
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    volume = Column(Float, nullable=False)
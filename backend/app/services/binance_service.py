@@ -1,110 +1,67 @@
 import ccxt
 import asyncio
-import time
-from app.core.config import settings
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.cache import CacheNamespace, LRUCache
+from app.services import indicators
+from app.services.indicators import WARMUP_CANDLES, IndicatorState, candle_open_time, timeframe_to_ms
+from app.services.candle_store import candle_store
+from app.services.exchange import get_exchange
 
 # 设置日志
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# 添加简单的内存缓存
-class SimpleCache:
-    def __init__(self, ttl: int = 60):
-        self.cache: Dict[str, tuple] = {}  # {key: (value, expiry_time)}
-        self.ttl = ttl
-        self.access_times: Dict[str, float] = {}  # 记录访问时间用于LRU
-    
-    def get(self, key: str) -> Optional[Any]:
-        if key in self.cache:
-            value, expiry = self.cache[key]
-            if time.time() < expiry:
-                self.access_times[key] = time.time()
-                return value
-            else:
-                del self.cache[key]
-                if key in self.access_times:
-                    del self.access_times[key]
-        return None
-    
-    def set(self, key: str, value: Any) -> None:
-        expiry = time.time() + self.ttl
-        self.cache[key] = (value, expiry)
-        self.access_times[key] = time.time()
-        
-        # 如果缓存项过多，清理最久未访问的项
-        if len(self.cache) > 100:  # 限制缓存大小
-            self._cleanup()
-    
-    def _cleanup(self) -> None:
-        # 清理过期项
-        current_time = time.time()
-        expired_keys = [key for key, (_, expiry) in self.cache.items() if current_time >= expiry]
-        for key in expired_keys:
-            del self.cache[key]
-            if key in self.access_times:
-                del self.access_times[key]
-        
-        # 如果仍然过多，按访问时间清理
-        if len(self.cache) > 100:
-            sorted_keys = sorted(self.access_times.items(), key=lambda x: x[1])
-            keys_to_remove = [key for key, _ in sorted_keys[:20]]  # 移除20个最久未访问的
-            for key in keys_to_remove:
-                del self.cache[key]
-                del self.access_times[key]
+# 各类缓存项的过期策略：价格和市场状态过期后先返回旧值并在后台刷新，
+# 账户信息用于交易决策，过期后必须等待最新数据
+CACHE_NAMESPACES = {
+    'current_price_': CacheNamespace(ttl=10, stale_ttl=30),
+    'market_state_': CacheNamespace(ttl=30, stale_ttl=60),
+    'account_': CacheNamespace(ttl=10),
+    # 长周期K线按K线边界过期，写入时单独指定TTL
+    'long_candles_': CacheNamespace(ttl=timeframe_to_ms('4h') // 1000),
+}
 
 # 创建缓存实例
-pricing_cache = SimpleCache(ttl=30)  # 30秒缓存
+pricing_cache = LRUCache(ttl=30, maxsize=100, namespaces=CACHE_NAMESPACES)
+
+# 构建市场状态时各个交易所请求的超时时间（秒），单个请求超时不会拖住其他请求
+MARKET_STATE_TIMEOUTS = {
+    'ticker': 5,
+    'ohlcv': 10,
+    'open_interest': 3,
+    'funding_rate': 3,
+}
+
+# 市场状态使用的K线窗口
+INTRADAY_TIMEFRAME, INTRADAY_LIMIT = '1m', 100
+# 4h窗口的最后一根是未收盘K线，需要多取一根，首次sync后已收盘K线数量就足以结束预热
+LONG_TIMEFRAME, LONG_LIMIT = '4h', WARMUP_CANDLES + 1
+
+# 每个(symbol, timeframe)的增量指标状态
+indicator_states: Dict[Tuple[str, str], IndicatorState] = {}
+
+
+def get_indicator_state(symbol: str, timeframe: str) -> IndicatorState:
+    """获取（必要时创建）增量指标状态"""
+    key = (symbol, timeframe)
+    if key not in indicator_states:
+        indicator_states[key] = IndicatorState(timeframe)
+    return indicator_states[key]
 
 
 class BinanceService:
     def __init__(self):
-        # 修改配置以避免自动加载某些需要特殊权限的API端点
-        self.exchange = ccxt.binance({
-            'apiKey': settings.BINANCE_API_KEY,
-            'secret': settings.BINANCE_API_SECRET,
-            'options': {
-                'defaultType': 'future',
-                'adjustForTimeDifference': True,
-                # 禁用自动加载某些API端点
-                'fetchCurrencies': False,
-            },
-            'timeout': 30000,
-            # 禁用某些可能导致问题的自动调用
-            'enableRateLimit': True,
-        })
-        # 禁用详细日志记录以提高性能
-        self.exchange.verbose = False
+        # 使用进程内共享的异步交易所客户端
+        self.exchange = get_exchange()
 
     async def get_current_price(self, symbol: str):
         """获取当前价格（优化版本，只获取必要数据）"""
-        # 检查缓存
-        cache_key = f"current_price_{symbol}"
-        cached_result = pricing_cache.get(cache_key)
-        if cached_result:
-            logger.info(f"Returning cached price for {symbol}")
-            return cached_result
-            
         try:
-            logger.info(f"Fetching current price for {symbol}")
-            normalized_symbol = symbol if '/' in symbol else f"{symbol}/USDT"
-            
-            # 直接获取ticker数据，只获取当前价格
-            ticker = await asyncio.get_event_loop().run_in_executor(
-                None, self.exchange.fetch_ticker, normalized_symbol
+            # 缓存未命中时，同一交易对的并发请求只会触发一次ticker请求
+            return await pricing_cache.get_or_fetch(
+                f"current_price_{symbol}", lambda: self._fetch_current_price(symbol)
             )
-            
-            current_price = ticker.get('last') or ticker.get('close') or 0
-            
-            result = {
-                'current_price': current_price
-            }
-            
-            # 缓存结果
-            pricing_cache.set(cache_key, result)
-            
-            return result
         except ccxt.AuthenticationError as e:
             logger.error(f"Authentication error fetching price: {e}")
             return {"error": f"Authentication failed: {str(e)}"}
@@ -118,117 +75,229 @@ class BinanceService:
             logger.error(f"Error fetching price: {e}")
             return {"error": str(e)}
 
+    async def _fetch_current_price(self, symbol: str):
+        logger.info(f"Fetching current price for {symbol}")
+        normalized_symbol = symbol if '/' in symbol else f"{symbol}/USDT"
+        
+        # 直接获取ticker数据，只获取当前价格
+        ticker = await self.exchange.fetch_ticker(normalized_symbol)
+        
+        current_price = ticker.get('last') or ticker.get('close') or 0
+        
+        return {
+            'current_price': current_price
+        }
+
+    async def get_current_prices(self, symbols: List[str], force: bool = False) -> Dict[str, Dict[str, Any]]:
+        """批量获取多个交易对的当前价格：缓存未命中的交易对合并为一次全量最新价请求
+
+        force为True时忽略缓存，直接向交易所请求（用于后台刷新）
+        """
+        normalized = {symbol: symbol if '/' in symbol else f"{symbol}/USDT" for symbol in symbols}
+        results: Dict[str, Dict[str, Any]] = {}
+        missing, stale = [], []
+        for symbol, normalized_symbol in normalized.items():
+            if force:
+                missing.append(symbol)
+                continue
+            cached_result, fresh = pricing_cache.lookup(f"current_price_{normalized_symbol}")
+            if cached_result is None:
+                missing.append(symbol)
+            else:
+                results[symbol] = cached_result
+                if not fresh:
+                    stale.append(normalized_symbol)
+        if not missing:
+            if stale:
+                # 旧价格先返回，在后台用一次全量请求刷新
+                pricing_cache.refresh("last_prices", lambda: self._refresh_last_prices(stale))
+            return results
+        
+        try:
+            logger.info(f"Fetching current prices for {len(missing)} symbols")
+            # 一次请求返回所有交易对的最新价，交易所权重不随交易对数量增加；
+            # 并发的批量请求也合并为一次
+            last_prices = await pricing_cache.coalesce("last_prices", self.exchange.fetch_last_prices)
+        except ccxt.AuthenticationError as e:
+            logger.error(f"Authentication error fetching prices: {e}")
+            error = f"Authentication failed: {str(e)}"
+        except ccxt.NetworkError as e:
+            logger.error(f"Network error fetching prices: {e}")
+            error = f"Network error: {str(e)}"
+        except ccxt.ExchangeError as e:
+            logger.error(f"Exchange error fetching prices: {e}")
+            error = f"Exchange error: {str(e)}"
+        except Exception as e:
+            logger.error(f"Error fetching prices: {e}")
+            error = str(e)
+        else:
+            fetched = self._store_last_prices(last_prices, [normalized[symbol] for symbol in missing] + stale)
+            for symbol in missing:
+                normalized_symbol = normalized[symbol]
+                results[symbol] = fetched.get(
+                    normalized_symbol, {"error": f"No price returned for {normalized_symbol}"}
+                )
+            return results
+        
+        for symbol in missing:
+            results[symbol] = {"error": error}
+        return results
+
+    async def _refresh_last_prices(self, symbols: List[str]) -> Dict[str, Any]:
+        last_prices = await self.exchange.fetch_last_prices()
+        self._store_last_prices(last_prices, symbols)
+        return last_prices
+
+    def _store_last_prices(self, last_prices: Dict[str, Any], symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """从全量最新价中取出指定交易对，逐个写入缓存（与单个价格接口共用缓存项）"""
+        results = {}
+        for symbol in symbols:
+            last_price = self._lookup_by_market(last_prices, symbol)
+            if not last_price or last_price.get('price') is None:
+                continue
+            result = {
+                'current_price': last_price['price']
+            }
+            pricing_cache.set(f"current_price_{symbol}", result)
+            results[symbol] = result
+        return results
+
+    def _lookup_by_market(self, data: Dict[str, Any], symbol: str) -> Optional[Dict[str, Any]]:
+        """按交易对查找结果，兼容合约市场的完整符号（如 BTC/USDT:USDT）"""
+        if symbol in data:
+            return data[symbol]
+        try:
+            return data.get(self.exchange.market(symbol)['symbol'])
+        except Exception:
+            return None
+
+    async def _fetch_open_interest(self, symbol: str) -> float:
+        """获取持仓量（如果支持）"""
+        if not hasattr(self.exchange, 'fapiPublicGetOpenInterest'):
+            return 0
+        open_interest_data = await self.exchange.fapiPublicGetOpenInterest({'symbol': symbol.replace('/', '')})
+        return float(open_interest_data['openInterest']) if open_interest_data else 0
+
+    async def _fetch_funding_rate(self, symbol: str) -> float:
+        """获取资金费率（如果支持）"""
+        if not hasattr(self.exchange, 'fapiPublicGetPremiumIndex'):
+            return 0
+        premium_index = await self.exchange.fapiPublicGetPremiumIndex({'symbol': symbol.replace('/', '')})
+        # 指定symbol时返回单个对象，否则返回列表
+        if isinstance(premium_index, list):
+            premium_index = premium_index[0] if premium_index else None
+        return float(premium_index['lastFundingRate']) if premium_index else 0
+
+    async def _ohlcv_or_local(self, symbol: str, timeframe: str, limit: int, result, required: bool = False):
+        """K线请求失败时退回到本地已存储的K线"""
+        if not isinstance(result, BaseException):
+            return result
+        logger.warning(f"Could not fetch {timeframe} candles for {symbol}, using local candles: {result!r}")
+        local = await asyncio.get_event_loop().run_in_executor(
+            None, candle_store.merge, symbol, timeframe, [], limit
+        )
+        if not local and required:
+            raise result
+        return local
+
+    async def fetch_ohlcv(self, symbol: str, timeframe: str, limit: int):
+        """增量获取K线：只向交易所请求本地最新一根之后的K线，窗口从本地存储读取"""
+        # 本地存储是同步的数据库访问，仍放到线程池中执行
+        loop = asyncio.get_event_loop()
+        last_open_time = await loop.run_in_executor(
+            None, candle_store.last_open_time, symbol, timeframe
+        )
+        
+        # 本地没有数据或数据已经落后超过一个窗口时，直接拉取完整窗口
+        if last_open_time is None or self.exchange.milliseconds() - last_open_time > limit * timeframe_to_ms(timeframe):
+            since = None
+        else:
+            # 从本地最新一根开始拉取，它在上次写入时可能还未收盘
+            since = last_open_time
+        
+        ohlcv = await self.exchange.fetch_ohlcv(symbol, timeframe, since, limit)
+        return await loop.run_in_executor(
+            None, candle_store.merge, symbol, timeframe, ohlcv, limit
+        )
+
+    def _cached_long_candles(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """读取缓存的4h K线；1分钟K线窗口已经覆盖不到缓存时的未收盘K线时视为失效"""
+        long_candles = pricing_cache.get(f"long_candles_{symbol}")
+        if long_candles is None:
+            return None
+        window_start = self.exchange.milliseconds() - (INTRADAY_LIMIT - 1) * timeframe_to_ms(INTRADAY_TIMEFRAME)
+        if long_candles['base_time'] < candle_open_time(window_start, INTRADAY_TIMEFRAME):
+            return None
+        return long_candles
+
+    async def _fetch_long_candles(self, symbol: str, long_candles: Optional[Dict[str, Any]]):
+        if long_candles is not None:
+            return long_candles['ohlcv']
+        return await self.fetch_ohlcv(symbol, LONG_TIMEFRAME, LONG_LIMIT)
+
+    def _cache_long_candles(self, symbol: str, ohlcv4h, ohlcv1m) -> None:
+        """缓存4h K线直到下一根4h K线开盘，同时记下此时最新的1分钟K线，之后只需累加在它之后的成交"""
+        if not ohlcv4h or not ohlcv1m:
+            return
+        next_open_time = ohlcv4h[-1][0] + timeframe_to_ms(LONG_TIMEFRAME)
+        ttl = (next_open_time - self.exchange.milliseconds()) / 1000
+        if ttl <= 0:
+            # 交易所还没有生成新的K线，下次重新请求
+            return
+        pricing_cache.set(f"long_candles_{symbol}", {
+            'ohlcv': ohlcv4h,
+            'base_time': ohlcv1m[-1][0],
+            'base_volume': ohlcv1m[-1][5] or 0,
+        }, ttl=ttl)
+
+    def _live_long_candle(self, long_candles: Dict[str, Any], ohlcv1m, last_price: Optional[float]) -> List[float]:
+        """用缓存之后的1分钟K线推算当前未收盘的4h K线"""
+        forming = list(long_candles['ohlcv'][-1])
+        base_time, base_volume = long_candles['base_time'], long_candles['base_volume']
+        for candle in ohlcv1m:
+            if candle[0] < base_time or candle[0] < forming[0]:
+                continue
+            forming[2] = max(forming[2], candle[2])
+            forming[3] = min(forming[3], candle[3])
+            forming[4] = candle[4]
+            # 缓存时最新的那根1分钟K线只累加之后新增的成交量
+            forming[5] += (candle[5] or 0) - (base_volume if candle[0] == base_time else 0)
+        if last_price:
+            forming[2] = max(forming[2], last_price)
+            forming[3] = min(forming[3], last_price)
+            forming[4] = last_price
+        return forming
+
     def calculate_ema(self, prices, period):
         """计算EMA指标"""
         if len(prices) < period:
             return prices[-1] if prices else 0
-        
-        # 简单移动平均作为初始EMA
-        sma = sum(prices[:period]) / period
-        ema = sma
-        multiplier = 2 / (period + 1)
-        
-        # 计算后续EMA值
-        for price in prices[period:]:
-            ema = (price - ema) * multiplier + ema
-            
-        return ema
+        return float(indicators.ema_series(prices, period)[-1])
 
     def calculate_macd(self, prices, fast_period=12, slow_period=26, signal_period=9):
         """计算MACD指标"""
         if len(prices) < slow_period:
             return {"macd": 0, "signal": 0, "histogram": 0}
-        
-        # 计算快速EMA和慢速EMA
-        fast_ema = []
-        slow_ema = []
-        multiplier_fast = 2 / (fast_period + 1)
-        multiplier_slow = 2 / (slow_period + 1)
-        
-        # 初始化EMA
-        fast_sma = sum(prices[:fast_period]) / fast_period
-        slow_sma = sum(prices[:slow_period]) / slow_period
-        fast_ema_value = fast_sma
-        slow_ema_value = slow_sma
-        
-        # 计算EMA序列
-        for i, price in enumerate(prices):
-            if i < fast_period - 1:
-                fast_ema.append(fast_sma)
-            else:
-                fast_ema_value = (price - fast_ema_value) * multiplier_fast + fast_ema_value
-                fast_ema.append(fast_ema_value)
-                
-            if i < slow_period - 1:
-                slow_ema.append(slow_sma)
-            else:
-                slow_ema_value = (price - slow_ema_value) * multiplier_slow + slow_ema_value
-                slow_ema.append(slow_ema_value)
-        
-        # 计算MACD线
-        macd_line = [fast_ema[i] - slow_ema[i] for i in range(len(fast_ema))]
-        
-        # 计算信号线
-        signal_line = []
-        signal_sma = sum(macd_line[-signal_period:]) / signal_period if len(macd_line) >= signal_period else 0
-        signal_ema = signal_sma
-        
-        for i, macd in enumerate(macd_line[-signal_period:]):
-            if i == 0:
-                signal_line.append(signal_sma)
-            else:
-                signal_ema = (macd - signal_ema) * (2 / (signal_period + 1)) + signal_ema
-                signal_line.append(signal_ema)
-        
-        # 计算柱状图
-        histogram = macd_line[-1] - (signal_line[-1] if signal_line else 0)
-        
-        return {
-            "macd": macd_line[-1],
-            "signal": signal_line[-1] if signal_line else 0,
-            "histogram": histogram
-        }
+        return self._latest_macd(indicators.macd_series(prices, fast_period, slow_period, signal_period))
 
     def calculate_rsi(self, prices, period=14):
         """计算RSI指标"""
         if len(prices) < period + 1:
             return 50  # 默认值
-        
-        # 计算价格变化
-        deltas = [prices[i] - prices[i-1] for i in range(1, len(prices))]
-        
-        # 分离正负变化
-        gains = [delta if delta > 0 else 0 for delta in deltas]
-        losses = [-delta if delta < 0 else 0 for delta in deltas]
-        
-        # 计算平均增益和平均损失
-        avg_gain = sum(gains[:period]) / period
-        avg_loss = sum(losses[:period]) / period
-        
-        # 计算后续的平均值
-        for i in range(period, len(gains)):
-            avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-            avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-        
-        # 计算RSI
-        if avg_loss == 0:
-            return 100
-        rs = avg_gain / avg_loss
-        rsi = 100 - (100 / (1 + rs))
-        
-        return rsi
-
-    async def get_current_market_state(self, symbol: str):
-        """获取当前市场状态"""
-        # 检查缓存
-        cache_key = f"market_state_{symbol}"
-        cached_result = pricing_cache.get(cache_key)
-        if cached_result:
-            logger.info(f"Returning cached market state for {symbol}")
-            return cached_result
-            
+        return float(indicators.rsi_series(prices, period)[-1])
+
+    @staticmethod
+    def _latest_macd(macd_data):
+        """取MACD序列的最新值"""
+        return {
+            "macd": float(macd_data["macd"][-1]),
+            "signal": float(macd_data["signal"][-1]),
+            "histogram": float(macd_data["histogram"][-1])
+        }
+
+    async def get_current_market_state(self, symbol: str, force: bool = False):
+        """获取当前市场状态，force为True时忽略缓存重新构建"""
         try:
-            logger.info(f"Fetching market state for {symbol}")
             normalized_symbol = symbol if '/' in symbol else f"{symbol}/USDT"
             
             # 检查交易所连接
@@ -236,104 +305,13 @@ class BinanceService:
                 logger.error("Binance API credentials are missing or invalid")
                 return {"error": "API credentials are missing or invalid"}
             
-            # 使用公共API获取市场数据
-            ticker = await asyncio.get_event_loop().run_in_executor(
-                None, self.exchange.fetch_ticker, normalized_symbol
-            )
-            
-            # 获取OHLCV数据（1分钟和4小时）
-            ohlcv1m = await asyncio.get_event_loop().run_in_executor(
-                None, self.exchange.fetch_ohlcv, normalized_symbol, '1m', None, 100
-            )
-            
-            ohlcv4h = await asyncio.get_event_loop().run_in_executor(
-                None, self.exchange.fetch_ohlcv, normalized_symbol, '4h', None, 50
+            cache_key = f"market_state_{symbol}"
+            if force:
+                pricing_cache.invalidate(cache_key)
+            # 缓存未命中时，同一交易对的并发请求只会触发一次构建
+            return await pricing_cache.get_or_fetch(
+                cache_key, lambda: self._build_market_state(symbol, normalized_symbol)
             )
-            
-            closes1m = [float(candle[4]) for candle in ohlcv1m]
-            closes4h = [float(candle[4]) for candle in ohlcv4h]
-            
-            # 计算技术指标
-            current_price = ticker['last'] if ticker and 'last' in ticker else (closes1m[-1] if closes1m else 0)
-            ema20_1m = self.calculate_ema(closes1m, 20)
-            ema20_4h = self.calculate_ema(closes4h, 20) if len(closes4h) >= 20 else current_price
-            ema50_4h = self.calculate_ema(closes4h, 50) if len(closes4h) >= 50 else current_price
-            macd_data_1m = self.calculate_macd(closes1m)
-            macd_data_4h = self.calculate_macd(closes4h, 12, 26, 9) if len(closes4h) >= 26 else {"macd": 0, "signal": 0, "histogram": 0}
-            rsi7 = self.calculate_rsi(closes1m, 7)
-            rsi14_1m = self.calculate_rsi(closes1m, 14)
-            rsi14_4h = self.calculate_rsi(closes4h, 14) if len(closes4h) >= 14 else 50
-            
-            # 计算ATR指标
-            atr3_4h = self.calculate_atr(ohlcv4h, 3) if len(ohlcv4h) >= 3 else 0
-            atr14_4h = self.calculate_atr(ohlcv4h, 14) if len(ohlcv4h) >= 14 else 0
-            
-            # 获取持仓量和资金费率（如果支持）
-            open_interest = 0
-            funding_rate = 0
-            try:
-                # 尝试获取持仓量数据
-                if hasattr(self.exchange, 'fapiPublicGetOpenInterest'):
-                    open_interest_data = await asyncio.get_event_loop().run_in_executor(
-                        None, self.exchange.fapiPublicGetOpenInterest, {'symbol': normalized_symbol.replace('/', '')}
-                    )
-                    open_interest = float(open_interest_data['openInterest']) if open_interest_data else 0
-                
-                # 尝试获取资金费率
-                if hasattr(self.exchange, 'fapiPublicGetPremiumIndex'):
-                    premium_index = await asyncio.get_event_loop().run_in_executor(
-                        None, self.exchange.fapiPublicGetPremiumIndex, {'symbol': normalized_symbol.replace('/', '')}
-                    )
-                    funding_rate = float(premium_index[0]['lastFundingRate']) if premium_index and len(premium_index) > 0 else 0
-            except Exception as e:
-                logger.warning(f"Could not fetch open interest or funding rate: {e}")
-            
-            # 计算平均持仓量（最近10个数据点）
-            avg_open_interest = open_interest  # 简化处理
-            
-            # 获取交易量数据
-            current_volume = ticker.get('baseVolume', 0) if ticker else 0
-            avg_volume = sum([float(candle[5]) for candle in ohlcv4h[-10:]]) / 10 if len(ohlcv4h) >= 10 else current_volume
-            
-            result = {
-                'current_price': current_price,
-                'current_ema20_1m': ema20_1m,
-                'current_ema20_4h': ema20_4h,
-                'current_ema50_4h': ema50_4h,
-                'current_macd_1m': macd_data_1m,
-                'current_macd_4h': macd_data_4h,
-                'current_rsi7': rsi7,
-                'current_rsi14_1m': rsi14_1m,
-                'current_rsi14_4h': rsi14_4h,
-                'atr3_4h': atr3_4h,
-                'atr14_4h': atr14_4h,
-                'open_interest': {
-                    'latest': open_interest,
-                    'average': avg_open_interest
-                },
-                'funding_rate': funding_rate,
-                'volume': {
-                    'current': current_volume,
-                    'average': avg_volume
-                },
-                'intraday': {
-                    'mid_prices': closes1m[-10:] if len(closes1m) >= 10 else closes1m,
-                    'ema20_series': [self.calculate_ema(closes1m[:i], 20) for i in range(20, len(closes1m)+1)][-10:] if len(closes1m) >= 20 else [],
-                    'macd_series': [self.calculate_macd(closes1m[:i])['macd'] for i in range(26, len(closes1m)+1)][-10:] if len(closes1m) >= 26 else [],
-                    'rsi7_series': [self.calculate_rsi(closes1m[:i], 7) for i in range(7, len(closes1m)+1)][-10:] if len(closes1m) >= 7 else [],
-                    'rsi14_series': [self.calculate_rsi(closes1m[:i], 14) for i in range(14, len(closes1m)+1)][-10:] if len(closes1m) >= 14 else []
-                },
-                'long_term_context': {
-                    'ema20_4h_series': [self.calculate_ema(closes4h[:i], 20) for i in range(20, len(closes4h)+1)][-10:] if len(closes4h) >= 20 else [],
-                    'macd_4h_series': [self.calculate_macd(closes4h[:i], 12, 26, 9)['macd'] for i in range(26, len(closes4h)+1)][-10:] if len(closes4h) >= 26 else [],
-                    'rsi14_4h_series': [self.calculate_rsi(closes4h[:i], 14) for i in range(14, len(closes4h)+1)][-10:] if len(closes4h) >= 14 else []
-                }
-            }
-            
-            # 缓存结果
-            pricing_cache.set(cache_key, result)
-            
-            return result
         except ccxt.AuthenticationError as e:
             logger.error(f"Authentication error fetching market state: {e}")
             return {"error": f"Authentication failed: {str(e)}"}
@@ -347,58 +325,142 @@ class BinanceService:
             logger.error(f"Error fetching market state: {e}")
             return {"error": str(e)}
 
+    async def _build_market_state(self, symbol: str, normalized_symbol: str):
+        """从交易所数据构建市场状态"""
+        logger.info(f"Fetching market state for {symbol}")
+        
+        # 4h已收盘K线在下一根4h K线开盘前不会变化，缓存期间不再请求交易所
+        long_candles = self._cached_long_candles(normalized_symbol)
+        
+        # 并发获取互相独立的市场数据，总耗时约等于最慢的单个请求
+        ticker, ohlcv1m, ohlcv4h, open_interest, funding_rate = await asyncio.gather(
+            asyncio.wait_for(
+                self.exchange.fetch_ticker(normalized_symbol), MARKET_STATE_TIMEOUTS['ticker']
+            ),
+            asyncio.wait_for(
+                self.fetch_ohlcv(normalized_symbol, INTRADAY_TIMEFRAME, INTRADAY_LIMIT), MARKET_STATE_TIMEOUTS['ohlcv']
+            ),
+            asyncio.wait_for(
+                self._fetch_long_candles(normalized_symbol, long_candles), MARKET_STATE_TIMEOUTS['ohlcv']
+            ),
+            asyncio.wait_for(
+                self._fetch_open_interest(normalized_symbol), MARKET_STATE_TIMEOUTS['open_interest']
+            ),
+            asyncio.wait_for(
+                self._fetch_funding_rate(normalized_symbol), MARKET_STATE_TIMEOUTS['funding_rate']
+            ),
+            return_exceptions=True
+        )
+
+        # 部分请求失败时尽量使用其余结果
+        if isinstance(ticker, BaseException):
+            logger.warning(f"Could not fetch ticker for {symbol}, using last close: {ticker!r}")
+            ticker = None
+        # 1分钟K线是必需的，本地也没有数据时才整体失败
+        ohlcv1m = await self._ohlcv_or_local(normalized_symbol, INTRADAY_TIMEFRAME, INTRADAY_LIMIT, ohlcv1m, required=True)
+        if long_candles is not None:
+            # 使用缓存的已收盘K线，未收盘K线用之后的1分钟K线和最新价推算
+            last_price = ticker.get('last') if ticker else None
+            ohlcv4h = long_candles['ohlcv'][:-1] + [self._live_long_candle(long_candles, ohlcv1m, last_price)]
+        elif isinstance(ohlcv4h, BaseException):
+            ohlcv4h = await self._ohlcv_or_local(normalized_symbol, LONG_TIMEFRAME, LONG_LIMIT, ohlcv4h)
+        else:
+            self._cache_long_candles(normalized_symbol, ohlcv4h, ohlcv1m)
+        if isinstance(open_interest, BaseException):
+            logger.warning(f"Could not fetch open interest for {symbol}: {open_interest!r}")
+            open_interest = 0
+        if isinstance(funding_rate, BaseException):
+            logger.warning(f"Could not fetch funding rate for {symbol}: {funding_rate!r}")
+            funding_rate = 0
+
+        # 合并新K线到增量指标状态（已处理过的K线不会重算）
+        state1m = get_indicator_state(normalized_symbol, INTRADAY_TIMEFRAME)
+        state4h = get_indicator_state(normalized_symbol, LONG_TIMEFRAME)
+        state1m.sync(ohlcv1m)
+        state4h.sync(ohlcv4h)
+        indicators1m = state1m.snapshot()
+        indicators4h = state4h.snapshot()
+        closes1m = indicators1m['closes']
+
+        # 读取技术指标
+        current_price = ticker['last'] if ticker and 'last' in ticker else (closes1m[-1] if closes1m else 0)
+        no_macd = {"macd": 0, "signal": 0, "histogram": 0}
+        ema20_1m = indicators1m['ema20'] if indicators1m['ema20'] is not None else (closes1m[-1] if closes1m else 0)
+        ema20_4h = indicators4h['ema20'] if indicators4h['ema20'] is not None else current_price
+        ema50_4h = indicators4h['ema50'] if indicators4h['ema50'] is not None else current_price
+        macd_data_1m = indicators1m['macd'] or no_macd
+        macd_data_4h = indicators4h['macd'] or no_macd
+        rsi7 = indicators1m['rsi7']
+        rsi14_1m = indicators1m['rsi14']
+        rsi14_4h = indicators4h['rsi14']
+
+        # 计算ATR指标
+        atr3_4h = indicators4h['atr3']
+        atr14_4h = indicators4h['atr14']
+
+        # 计算平均持仓量（最近10个数据点）
+        avg_open_interest = open_interest  # 简化处理
+
+        # 获取交易量数据
+        current_volume = ticker.get('baseVolume', 0) if ticker else 0
+        volumes4h = indicators4h['volumes']
+        avg_volume = sum(volumes4h) / 10 if len(volumes4h) >= 10 else current_volume
+
+        result = {
+            'current_price': current_price,
+            'current_ema20_1m': ema20_1m,
+            'current_ema20_4h': ema20_4h,
+            'current_ema50_4h': ema50_4h,
+            'current_macd_1m': macd_data_1m,
+            'current_macd_4h': macd_data_4h,
+            'current_rsi7': rsi7,
+            'current_rsi14_1m': rsi14_1m,
+            'current_rsi14_4h': rsi14_4h,
+            'atr3_4h': atr3_4h,
+            'atr14_4h': atr14_4h,
+            'open_interest': {
+                'latest': open_interest,
+                'average': avg_open_interest
+            },
+            'funding_rate': funding_rate,
+            'volume': {
+                'current': current_volume,
+                'average': avg_volume
+            },
+            'intraday': {
+                'mid_prices': closes1m,
+                'ema20_series': indicators1m['series']['ema20'],
+                'macd_series': indicators1m['series']['macd'],
+                'rsi7_series': indicators1m['series']['rsi7'],
+                'rsi14_series': indicators1m['series']['rsi14']
+            },
+            'long_term_context': {
+                'ema20_4h_series': indicators4h['series']['ema20'],
+                'macd_4h_series': indicators4h['series']['macd'],
+                'rsi14_4h_series': indicators4h['series']['rsi14']
+            }
+        }
+        
+        return result
+
     def calculate_atr(self, ohlcv, period):
         """计算ATR指标"""
         if len(ohlcv) < period + 1:
             return 0
-        
-        tr_values = []
-        for i in range(1, len(ohlcv)):
-            high = float(ohlcv[i][2])
-            low = float(ohlcv[i][3])
-            prev_close = float(ohlcv[i-1][4])
-            
-            tr = max(high - low, abs(high - prev_close), abs(low - prev_close))
-            tr_values.append(tr)
-        
-        # 计算ATR
-        atr = sum(tr_values[-period:]) / period
-        return atr
+        return float(indicators.atr_series(ohlcv, period)[-1])
 
     async def get_account_information_and_performance(self, initial_capital: float):
         """获取账户信息和性能"""
         try:
-            logger.info("Fetching account information")
-            
             # 检查交易所连接
             if not self.exchange.check_required_credentials(False):
                 logger.error("Binance API credentials are missing or invalid")
                 return {"error": "API credentials are missing or invalid"}
             
-            # 使用简化的方法获取账户信息
-            balance = await asyncio.get_event_loop().run_in_executor(
-                None, self.exchange.fetch_balance
+            # 指标采集和交易决策在短时间内共用同一份账户数据，下单后由执行器清除
+            return await pricing_cache.get_or_fetch(
+                f"account_{initial_capital}", lambda: self._fetch_account_information(initial_capital)
             )
-            
-            total_cash_value = balance['USDT']['total'] if 'USDT' in balance else 0
-            available_cash = balance['USDT']['free'] if 'USDT' in balance else 0
-            current_total_return = (total_cash_value - initial_capital) / initial_capital if initial_capital > 0 else 0
-            
-            # 获取持仓信息（如果支持）
-            positions = []
-            try:
-                positions = await asyncio.get_event_loop().run_in_executor(
-                    None, self.exchange.fetch_positions
-                )
-            except Exception as pos_error:
-                logger.warning(f"Could not fetch positions: {pos_error}")
-            
-            return {
-                'totalCashValue': total_cash_value,
-                'availableCash': available_cash,
-                'currentTotalReturn': current_total_return,
-                'positions': positions
-            }
         except ccxt.AuthenticationError as e:
             logger.error(f"Authentication error fetching account info: {e}")
             return {"error": f"Authentication failed: {str(e)}"}
@@ -410,4 +472,28 @@ class BinanceService:
             return {"error": f"Exchange error: {str(e)}"}
         except Exception as e:
             logger.error(f"Error fetching account info: {e}")
-            return {"error": str(e)}
\ No newline at end of file
+            return {"error": str(e)}
+
+    async def _fetch_account_information(self, initial_capital: float):
+        logger.info("Fetching account information")
+        
+        # 使用简化的方法获取账户信息
+        balance = await self.exchange.fetch_balance()
+        
+        total_cash_value = balance['USDT']['total'] if 'USDT' in balance else 0
+        available_cash = balance['USDT']['free'] if 'USDT' in balance else 0
+        current_total_return = (total_cash_value - initial_capital) / initial_capital if initial_capital > 0 else 0
+        
+        # 获取持仓信息（如果支持）
+        positions = []
+        try:
+            positions = await self.exchange.fetch_positions()
+        except Exception as pos_error:
+            logger.warning(f"Could not fetch positions: {pos_error}")
+        
+        return {
+            'totalCashValue': total_cash_value,
+            'availableCash': available_cash,
+            'currentTotalReturn': current_total_return,
+            'positions': positions
+        }
\ No newline at end of file
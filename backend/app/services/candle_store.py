@@ -0,0 +1,93 @@
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import sessionmaker
+from app.core.database import SessionLocal
+from app.models.trading import Candle
+from app.services.indicators import timeframe_to_ms
+import logging
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# 每个(symbol, timeframe)最多保留的K线数量
+CANDLE_RETENTION = 10000
+
+_DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+class CandleStore:
+    """本地OHLCV存储，按(symbol, timeframe, open_time)去重"""
+
+    def __init__(self, session_factory: sessionmaker = SessionLocal, retention: int = CANDLE_RETENTION):
+        self.session_factory = session_factory
+        self.retention = retention
+
+    def last_open_time(self, symbol: str, timeframe: str) -> Optional[int]:
+        """本地最新一根K线的开盘时间"""
+        db = self.session_factory()
+        try:
+            row = db.query(Candle.open_time) \
+                    .filter(Candle.symbol == symbol, Candle.timeframe == timeframe) \
+                    .order_by(Candle.open_time.desc()) \
+                    .first()
+            return int(row[0]) if row else None
+        finally:
+            db.close()
+
+    def merge(self, symbol: str, timeframe: str, ohlcv: Sequence[Sequence[float]], limit: int) -> List[List[float]]:
+        """写入新K线（已存在的会被覆盖，用于修订未收盘K线），并返回最近limit根K线"""
+        db = self.session_factory()
+        try:
+            if ohlcv:
+                self._upsert(db, symbol, timeframe, ohlcv)
+                # 超过保留数量的旧K线直接删除
+                cutoff = int(ohlcv[-1][0]) - self.retention * timeframe_to_ms(timeframe)
+                db.query(Candle) \
+                  .filter(Candle.symbol == symbol, Candle.timeframe == timeframe, Candle.open_time <= cutoff) \
+                  .delete(synchronize_session=False)
+                db.commit()
+
+            rows = db.query(Candle.open_time, Candle.open, Candle.high, Candle.low, Candle.close, Candle.volume) \
+                     .filter(Candle.symbol == symbol, Candle.timeframe == timeframe) \
+                     .order_by(Candle.open_time.desc()) \
+                     .limit(limit) \
+                     .all()
+            return [[int(row[0]), row[1], row[2], row[3], row[4], row[5]] for row in reversed(rows)]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _upsert(self, db, symbol: str, timeframe: str, ohlcv: Sequence[Sequence[float]]) -> None:
+        values = [
+            {
+                "symbol": symbol,
+                "timeframe": timeframe,
+                "open_time": int(candle[0]),
+                "open": float(candle[1]),
+                "high": float(candle[2]),
+                "low": float(candle[3]),
+                "close": float(candle[4]),
+                "volume": float(candle[5] or 0),
+            }
+            for candle in ohlcv
+        ]
+        insert = _DIALECT_INSERTS.get(db.bind.dialect.name)
+        if insert is None:
+            # 其他数据库退化为逐条merge
+            for value in values:
+                db.merge(Candle(**value))
+            return
+
+        stmt = insert(Candle.__table__).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["symbol", "timeframe", "open_time"],
+            set_={column: stmt.excluded[column] for column in ("open", "high", "low", "close", "volume")},
+        )
+        db.execute(stmt)
+
+
+candle_store = CandleStore()
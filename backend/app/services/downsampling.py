@@ -0,0 +1,37 @@
+import numpy as np
+from typing import Sequence
+
+
+def lttb_indices(x: Sequence[float], y: Sequence[float], max_points: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets降采样，返回保留下来的点的下标（升序，包含首尾点）
+
+    首尾点之外的点均分到max_points-2个桶中，每个桶保留与上一个选中点、
+    下一个桶平均点构成三角形面积最大的点，因此尖峰和回撤会被保留。
+    """
+    n = len(x)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+
+    xs = np.asarray(x, dtype=float)
+    ys = np.asarray(y, dtype=float)
+    # 桶边界：第i个桶为 [edges[i], edges[i+1])
+    edges = np.linspace(1, n - 1, max_points - 1).astype(int)
+    counts = np.diff(edges)
+
+    # 所有桶的平均点一次性算出，作为前一个桶三角形的第三个顶点；最后一个桶使用终点
+    avg_x = np.add.reduceat(xs[:n - 1], edges[:-1]) / counts
+    avg_y = np.add.reduceat(ys[:n - 1], edges[:-1]) / counts
+    next_x = np.append(avg_x[1:], xs[-1])
+    next_y = np.append(avg_y[1:], ys[-1])
+
+    selected = np.empty(max_points, dtype=int)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    # 每个桶依赖上一个桶选中的点，只能逐桶进行，桶内的面积计算是向量化的
+    for i in range(max_points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs((xs[a] - next_x[i]) * (ys[lo:hi] - ys[a])
+                      - (xs[a] - xs[lo:hi]) * (next_y[i] - ys[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
@@ -0,0 +1,65 @@
+import asyncio
+import json
+import logging
+from typing import Any, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# 每个连接最多积压的消息数，超过说明客户端太慢，直接断开让它重连后重新拿快照
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+def format_event(event: str, data: Any) -> str:
+    """格式化为一条Server-Sent Events消息"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+class Subscription:
+    def __init__(self, queue_size: int):
+        self.queue: "asyncio.Queue[Optional[str]]" = asyncio.Queue(maxsize=queue_size)
+
+    async def next(self) -> Optional[str]:
+        """下一条消息，返回None表示订阅已被关闭"""
+        return await self.queue.get()
+
+    def close(self) -> None:
+        # 清空积压的消息并放入结束标记
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(None)
+
+
+class EventHub:
+    """进程内的推送中心：每个事件只序列化一次，然后分发给所有连接"""
+
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscribers.discard(subscription)
+
+    def publish(self, event: str, data: Any) -> None:
+        """向所有连接推送一条增量消息（需在事件循环线程中调用）"""
+        if not self._subscribers:
+            return
+        message = format_event(event, data)
+        for subscription in list(self._subscribers):
+            try:
+                subscription.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                logger.warning("Dropping slow stream subscriber")
+                self.unsubscribe(subscription)
+                subscription.close()
+
+
+event_hub = EventHub()
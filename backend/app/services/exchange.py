@@ -0,0 +1,61 @@
+import ccxt.async_support as ccxt_async
+from app.core.config import settings
+from app.services.rate_limiter import request_scheduler
+import logging
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScheduledBinance(ccxt_async.binance):
+    """合约接口的每次REST请求都先向共享的权重调度器申请额度"""
+
+    async def fetch2(self, path, api: Any = 'public', method='GET', params={}, headers: Any = None, body: Any = None, config={}):
+        if not request_scheduler.is_scheduled(api):
+            return await super().fetch2(path, api, method, params, headers, body, config)
+        # ccxt中合约接口的cost即Binance文档中的请求权重
+        weight = self.calculate_rate_limiter_cost(api, method, path, params, config)
+        await request_scheduler.acquire(weight, request_scheduler.priority_for(api))
+        try:
+            return await super().fetch2(path, api, method, params, headers, body, config)
+        finally:
+            request_scheduler.observe_headers(self.last_response_headers)
+
+
+_exchange: Optional[ScheduledBinance] = None
+
+
+def get_exchange() -> ScheduledBinance:
+    """获取进程内共享的异步Binance客户端
+
+    所有服务共用同一个ccxt实例，也就共用同一个aiohttp会话和连接池（keep-alive），
+    避免每次请求都经过线程池并重新建立连接；请求权重也由同一个调度器统一分配。
+    """
+    global _exchange
+    if _exchange is None:
+        _exchange = ScheduledBinance({
+            'apiKey': settings.BINANCE_API_KEY,
+            'secret': settings.BINANCE_API_SECRET,
+            'options': {
+                'defaultType': 'future',  # 使用合约交易
+                'adjustForTimeDifference': True,
+                # 禁用自动加载某些需要特殊权限的API端点
+                'fetchCurrencies': False,
+            },
+            'timeout': 30000,
+            'enableRateLimit': True,
+        })
+        # 禁用详细日志记录以提高性能
+        _exchange.verbose = False
+    return _exchange
+
+
+async def close_exchange() -> None:
+    """关闭共享客户端的HTTP会话（应用关闭时调用）"""
+    global _exchange
+    if _exchange is not None:
+        try:
+            await _exchange.close()
+            logger.info("Exchange client closed")
+        finally:
+            _exchange = None
@@ -0,0 +1,367 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+# 向量化结果与原逐步循环实现之间允许的误差：
+# |vectorized - legacy| <= INDICATOR_TOLERANCE * max(1, |legacy|)
+INDICATOR_TOLERANCE = 1e-9
+
+# 分块计算EMA时每块的长度，保证 decay ** -block 不会溢出
+_EMA_BLOCK_SIZE = 64
+
+
+def _ema_recursive(values: np.ndarray, alpha: float, initial: float) -> np.ndarray:
+    """以initial为初值，对values逐项执行 y = alpha * x + (1 - alpha) * y 的递推（分块向量化）"""
+    out = np.empty(len(values), dtype=float)
+    if len(values) == 0:
+        return out
+    if alpha >= 1:
+        out[:] = values
+        return out
+
+    decay = 1 - alpha
+    prev = initial
+    for start in range(0, len(values), _EMA_BLOCK_SIZE):
+        block = values[start:start + _EMA_BLOCK_SIZE]
+        powers = decay ** np.arange(1, len(block) + 1)
+        # y_k = decay^(k+1) * (y_-1 + alpha * sum_{j<=k} x_j / decay^(j+1))
+        out[start:start + len(block)] = powers * (prev + alpha * np.cumsum(block / powers))
+        prev = out[start + len(block) - 1]
+    return out
+
+
+def ema_series(prices: Sequence[float], period: int) -> np.ndarray:
+    """计算完整EMA序列，第i项等于前i+1个价格的EMA，不足period的位置为NaN"""
+    values = np.asarray(prices, dtype=float)
+    out = np.full(len(values), np.nan)
+    if len(values) < period:
+        return out
+
+    # 简单移动平均作为初始EMA
+    out[period - 1] = values[:period].mean()
+    out[period:] = _ema_recursive(values[period:], 2 / (period + 1), out[period - 1])
+    return out
+
+
+def _macd_ema(values: np.ndarray, period: int) -> np.ndarray:
+    """MACD内部使用的EMA：前period-1项为SMA，从第period-1项起以SMA为初值递推"""
+    sma = values[:period].mean()
+    out = np.full(len(values), sma)
+    out[period - 1:] = _ema_recursive(values[period - 1:], 2 / (period + 1), sma)
+    return out
+
+
+def _signal_weights(signal_period: int) -> np.ndarray:
+    """信号线权重：以最近signal_period个MACD值的均值为初值，再对其余signal_period-1个值递推。
+    这是一个固定长度的线性滤波器，可以直接用滑动窗口点积计算"""
+    k = 2 / (signal_period + 1)
+    decay = 1 - k
+    weights = np.full(signal_period, decay ** (signal_period - 1) / signal_period)
+    weights[1:] += k * decay ** (signal_period - 1 - np.arange(1, signal_period))
+    return weights
+
+
+def macd_series(prices: Sequence[float], fast_period: int = 12, slow_period: int = 26,
+                signal_period: int = 9) -> Dict[str, np.ndarray]:
+    """计算完整MACD序列（macd/signal/histogram），不足slow_period的位置为NaN"""
+    values = np.asarray(prices, dtype=float)
+    n = len(values)
+    macd = np.full(n, np.nan)
+    signal = np.full(n, np.nan)
+    if n < slow_period:
+        return {"macd": macd, "signal": signal, "histogram": np.full(n, np.nan)}
+
+    macd_line = _macd_ema(values, fast_period) - _macd_ema(values, slow_period)
+    macd[slow_period - 1:] = macd_line[slow_period - 1:]
+
+    if n >= signal_period:
+        windows = sliding_window_view(macd_line, signal_period)
+        signal[signal_period - 1:] = windows @ _signal_weights(signal_period)
+
+    # 窗口不足signal_period时（仅当signal_period > slow_period），初值为0且跳过第一个值
+    k = 2 / (signal_period + 1)
+    for t in range(slow_period - 1, min(signal_period - 1, n)):
+        signal_value = 0.0
+        for value in macd_line[1:t + 1]:
+            signal_value = (value - signal_value) * k + signal_value
+        signal[t] = signal_value
+
+    return {"macd": macd, "signal": signal, "histogram": macd - signal}
+
+
+def rsi_series(prices: Sequence[float], period: int = 14) -> np.ndarray:
+    """计算完整RSI序列（Wilder平滑），数据不足的位置为默认值50"""
+    values = np.asarray(prices, dtype=float)
+    out = np.full(len(values), 50.0)
+    if len(values) < period + 1:
+        return out
+
+    avg_gain, avg_loss = _wilder_averages(values, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100 - 100 / (1 + avg_gain / avg_loss)
+    out[period:] = np.where(avg_loss == 0, 100.0, rsi)
+    return out
+
+
+def _wilder_averages(values: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """RSI使用的Wilder平均涨幅/跌幅，第j项对应前period+j+1个价格"""
+    deltas = np.diff(values)
+    gains = np.clip(deltas, 0, None)
+    losses = np.clip(-deltas, 0, None)
+
+    alpha = 1 / period
+    avg_gain = np.empty(len(deltas) - period + 1)
+    avg_loss = np.empty(len(deltas) - period + 1)
+    avg_gain[0] = gains[:period].mean()
+    avg_loss[0] = losses[:period].mean()
+    avg_gain[1:] = _ema_recursive(gains[period:], alpha, avg_gain[0])
+    avg_loss[1:] = _ema_recursive(losses[period:], alpha, avg_loss[0])
+    return avg_gain, avg_loss
+
+
+def atr_series(ohlcv: Sequence[Sequence[float]], period: int) -> np.ndarray:
+    """计算完整ATR序列（最近period个真实波幅的简单平均），数据不足的位置为0"""
+    n = len(ohlcv)
+    out = np.zeros(n)
+    if n < period + 1:
+        return out
+
+    tr = _true_range(np.asarray(ohlcv, dtype=float))
+    out[period:] = sliding_window_view(tr, period).sum(axis=1) / period
+    return out
+
+
+def _true_range(candles: np.ndarray) -> np.ndarray:
+    """真实波幅序列，第j项对应第j+1根K线"""
+    highs = candles[1:, 2]
+    lows = candles[1:, 3]
+    prev_closes = candles[:-1, 4]
+    return np.maximum.reduce([highs - lows, np.abs(highs - prev_closes), np.abs(lows - prev_closes)])
+
+
+# ---------------------------------------------------------------------------
+# 增量（流式）指标状态
+# ---------------------------------------------------------------------------
+
+EMA_PERIODS = (20, 50)
+RSI_PERIODS = (7, 14)
+ATR_PERIODS = (3, 14)
+MACD_PERIODS = (12, 26, 9)
+
+# 至少收盘这么多根K线后才切换到O(1)增量更新，之前直接用向量化引擎重算
+WARMUP_CANDLES = max(max(EMA_PERIODS), MACD_PERIODS[1], max(RSI_PERIODS) + 1, max(ATR_PERIODS) + 1)
+
+# 每个状态保留的已收盘K线数量（用于mid_prices、成交量均值和预热阶段重算）
+CANDLE_BUFFER_SIZE = 100
+
+_TIMEFRAME_UNITS_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+
+def timeframe_to_ms(timeframe: str) -> int:
+    """将 '1m'、'4h' 这样的周期转换为毫秒"""
+    return int(timeframe[:-1]) * _TIMEFRAME_UNITS_MS[timeframe[-1]]
+
+
+def candle_open_time(timestamp: int, timeframe: str) -> int:
+    """timestamp（毫秒）所在K线的开盘时间"""
+    return timestamp - timestamp % timeframe_to_ms(timeframe)
+
+
+class _Accumulators:
+    """增量指标的运行状态：EMA值、Wilder平均值、TR窗口等，每根K线O(1)更新"""
+
+    def __init__(self):
+        self.ema: Dict[int, float] = {}
+        self.macd_fast = 0.0
+        self.macd_slow = 0.0
+        self.macd_window: Deque[float] = deque(maxlen=MACD_PERIODS[2])
+        self.rsi: Dict[int, List[float]] = {}  # {period: [avg_gain, avg_loss]}
+        self.tr_window: Deque[float] = deque(maxlen=max(ATR_PERIODS))
+        self.last_close = 0.0
+
+    @classmethod
+    def seed(cls, candles: Sequence[Sequence[float]]) -> "_Accumulators":
+        """用向量化引擎对已有K线做一次计算，得到与批量结果完全一致的初始状态"""
+        data = np.asarray(candles, dtype=float)
+        closes = data[:, 4]
+        fast, slow, signal = MACD_PERIODS
+
+        acc = cls()
+        for period in EMA_PERIODS:
+            acc.ema[period] = float(ema_series(closes, period)[-1])
+        fast_ema = _macd_ema(closes, fast)
+        slow_ema = _macd_ema(closes, slow)
+        acc.macd_fast = float(fast_ema[-1])
+        acc.macd_slow = float(slow_ema[-1])
+        acc.macd_window.extend((fast_ema - slow_ema)[-signal:].tolist())
+        for period in RSI_PERIODS:
+            avg_gain, avg_loss = _wilder_averages(closes, period)
+            acc.rsi[period] = [float(avg_gain[-1]), float(avg_loss[-1])]
+        acc.tr_window.extend(_true_range(data)[-max(ATR_PERIODS):].tolist())
+        acc.last_close = float(closes[-1])
+        return acc
+
+    def copy(self) -> "_Accumulators":
+        acc = _Accumulators()
+        acc.ema = dict(self.ema)
+        acc.macd_fast = self.macd_fast
+        acc.macd_slow = self.macd_slow
+        acc.macd_window = deque(self.macd_window, maxlen=self.macd_window.maxlen)
+        acc.rsi = {period: list(avgs) for period, avgs in self.rsi.items()}
+        acc.tr_window = deque(self.tr_window, maxlen=self.tr_window.maxlen)
+        acc.last_close = self.last_close
+        return acc
+
+    def push(self, candle: Sequence[float]) -> None:
+        """追加一根K线"""
+        high, low, close = float(candle[2]), float(candle[3]), float(candle[4])
+        prev_close = self.last_close
+        self.tr_window.append(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+
+        for period in self.ema:
+            self.ema[period] += (close - self.ema[period]) * 2 / (period + 1)
+
+        fast, slow, _ = MACD_PERIODS
+        self.macd_fast += (close - self.macd_fast) * 2 / (fast + 1)
+        self.macd_slow += (close - self.macd_slow) * 2 / (slow + 1)
+        self.macd_window.append(self.macd_fast - self.macd_slow)
+
+        delta = close - prev_close
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        for period, avgs in self.rsi.items():
+            avgs[0] = (avgs[0] * (period - 1) + gain) / period
+            avgs[1] = (avgs[1] * (period - 1) + loss) / period
+
+        self.last_close = close
+
+    def values(self) -> Dict[str, Any]:
+        """当前各指标的值"""
+        macd = self.macd_window[-1]
+        signal = float(np.dot(self.macd_window, _signal_weights(MACD_PERIODS[2])))
+        result: Dict[str, Any] = {f"ema{period}": value for period, value in self.ema.items()}
+        result["macd"] = {"macd": macd, "signal": signal, "histogram": macd - signal}
+        for period, (avg_gain, avg_loss) in self.rsi.items():
+            result[f"rsi{period}"] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + avg_gain / avg_loss)
+        for period in ATR_PERIODS:
+            result[f"atr{period}"] = sum(list(self.tr_window)[-period:]) / period
+        return result
+
+
+def _batch_values(candles: Sequence[Sequence[float]], history_size: int) -> Tuple[Dict[str, Any], Dict[str, List[float]]]:
+    """预热阶段：用向量化引擎对全部K线计算当前值和最近的序列"""
+    closes = [float(c[4]) for c in candles]
+    n = len(closes)
+    values: Dict[str, Any] = {}
+    series: Dict[str, List[float]] = {}
+    for period in EMA_PERIODS:
+        ema = ema_series(closes, period)
+        values[f"ema{period}"] = float(ema[-1]) if n >= period else None
+        series[f"ema{period}"] = ema[period - 1:][-history_size:].tolist() if n >= period else []
+    fast, slow, signal = MACD_PERIODS
+    macd = macd_series(closes, fast, slow, signal)
+    if n >= slow:
+        values["macd"] = {key: float(macd[key][-1]) for key in ("macd", "signal", "histogram")}
+        series["macd"] = macd["macd"][slow - 1:][-history_size:].tolist()
+    else:
+        values["macd"] = None
+        series["macd"] = []
+    for period in RSI_PERIODS:
+        rsi = rsi_series(closes, period)
+        values[f"rsi{period}"] = float(rsi[-1])
+        series[f"rsi{period}"] = rsi[period - 1:][-history_size:].tolist() if n >= period else []
+    for period in ATR_PERIODS:
+        values[f"atr{period}"] = float(atr_series(candles, period)[-1])
+    return values, series
+
+
+class IndicatorState:
+    """单个(symbol, timeframe)的增量指标状态
+
+    新K线收盘时O(1)推进运行状态；未收盘的K线变化时，只在已收盘状态的副本上重新应用这一根K线。
+    """
+
+    SERIES_NAMES = tuple(f"ema{p}" for p in EMA_PERIODS) + ("macd",) + tuple(f"rsi{p}" for p in RSI_PERIODS)
+
+    def __init__(self, timeframe: str, history_size: int = 10):
+        self.timeframe = timeframe
+        self.timeframe_ms = timeframe_to_ms(timeframe)
+        self.history_size = history_size
+        self.reset()
+
+    def reset(self) -> None:
+        self.candles: Deque[List[float]] = deque(maxlen=max(CANDLE_BUFFER_SIZE, WARMUP_CANDLES))
+        self.closed_count = 0
+        self.last_closed_time: Optional[int] = None
+        self.forming: Optional[List[float]] = None
+        self._closed: Optional[_Accumulators] = None
+        self._live: Optional[_Accumulators] = None
+        self._history: Dict[str, Deque[float]] = {name: deque(maxlen=self.history_size) for name in self.SERIES_NAMES}
+
+    def sync(self, ohlcv: Sequence[Sequence[float]]) -> None:
+        """合并交易所返回的K线：最后一根视为未收盘，其余视为已收盘，已处理过的K线会被跳过"""
+        if not ohlcv:
+            return
+        # 与已有状态之间有缺口时只能从这批数据重新开始
+        if self.last_closed_time is not None and ohlcv[0][0] > self.last_closed_time + self.timeframe_ms:
+            self.reset()
+
+        for candle in ohlcv[:-1]:
+            if self.last_closed_time is None or candle[0] > self.last_closed_time:
+                self.close_candle(candle)
+
+        latest = ohlcv[-1]
+        if self.last_closed_time is None or latest[0] > self.last_closed_time:
+            self.update_forming(latest)
+
+    def close_candle(self, candle: Sequence[float]) -> None:
+        """一根K线收盘"""
+        candle = [float(v) for v in candle[:6]]
+        self.candles.append(candle)
+        self.closed_count += 1
+        self.last_closed_time = int(candle[0])
+        if self.forming is not None and self.forming[0] <= candle[0]:
+            self.forming = None
+            self._live = None
+
+        if self._closed is not None:
+            self._closed.push(candle)
+            values = self._closed.values()
+            for name in self.SERIES_NAMES:
+                self._history[name].append(values[name]["macd"] if name == "macd" else values[name])
+        elif self.closed_count >= WARMUP_CANDLES:
+            self._closed = _Accumulators.seed(self.candles)
+            _, series = _batch_values(self.candles, self.history_size)
+            for name in self.SERIES_NAMES:
+                self._history[name].extend(series[name])
+
+    def update_forming(self, candle: Sequence[float]) -> None:
+        """更新（或替换）当前未收盘的K线"""
+        self.forming = [float(v) for v in candle[:6]]
+        if self._closed is not None:
+            self._live = self._closed.copy()
+            self._live.push(self.forming)
+
+    def _all_candles(self) -> List[List[float]]:
+        return list(self.candles) + ([self.forming] if self.forming is not None else [])
+
+    def snapshot(self, tail: int = 10) -> Dict[str, Any]:
+        """读取当前指标值和最近tail个序列点（包含未收盘K线），不做任何重算"""
+        candles = self._all_candles()
+        if self._closed is None:
+            values, series = _batch_values(candles, tail)
+        else:
+            live = self._live or self._closed
+            values = live.values()
+            series = {}
+            for name in self.SERIES_NAMES:
+                points = list(self._history[name])
+                if self._live is not None:
+                    points.append(values[name]["macd"] if name == "macd" else values[name])
+                series[name] = points[-tail:]
+
+        values["series"] = series
+        values["closes"] = [c[4] for c in candles[-tail:]]
+        values["volumes"] = [c[5] for c in candles[-tail:]]
+        values["candle_count"] = len(candles)
+        return values
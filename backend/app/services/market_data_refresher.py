@@ -0,0 +1,179 @@
+import asyncio
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from app.core.config import settings
+from app.services.binance_service import BinanceService
+from app.services.event_hub import event_hub
+from app.services.markets import market_metadata
+
+logger = logging.getLogger(__name__)
+
+# 价格刷新间隔（秒），对齐到整5秒
+PRICE_REFRESH_INTERVAL = 5
+# 市场状态刷新间隔（秒），整除60，保证每根1分钟K线收盘后都会刷新一次
+MARKET_STATE_REFRESH_INTERVAL = 15
+# K线收盘后延迟刷新的秒数，留给交易所生成收盘K线
+CANDLE_CLOSE_DELAY = 2
+# 除配置的交易对外，最多额外跟踪的交易对数量（由 /simple?symbols= 请求加入）
+MAX_EXTRA_SYMBOLS = 20
+# 额外交易对超过这个时间（秒）没有被请求就停止刷新
+EXTRA_SYMBOL_TTL = 10 * 60
+
+
+def seconds_until_boundary(interval: float, offset: float = 0, now: Optional[float] = None) -> float:
+    """距离下一个 interval 整数倍（再加offset）时刻的秒数"""
+    now = time.time() if now is None else now
+    return interval - ((now - offset) % interval)
+
+
+class MarketDataRefresher:
+    """后台按K线边界定时刷新价格和市场状态，HTTP接口直接读取内存中的最新结果"""
+
+    def __init__(self, binance_service: Optional[BinanceService] = None, symbols: Optional[List[str]] = None):
+        self.binance_service = binance_service
+        self.symbols: List[str] = list(symbols if symbols is not None else settings.PRICING_SYMBOLS)
+        self.extra_symbols: Dict[str, float] = {}  # {symbol: 最近一次被请求的时间戳}
+        self.prices: Dict[str, Dict[str, Any]] = {}  # {symbol: 价格结果}
+        self.market_states: Dict[str, Dict[str, Any]] = {}  # {symbol: 市场状态}
+        self.updated_at: Dict[str, float] = {}  # {"price_BTC" / "market_state_BTC": 最近一次成功刷新的时间戳}
+        # 数据版本号：价格或市场状态内容发生变化时递增（用于ETag）
+        self.versions: Dict[str, int] = {"price_": 0, "market_state_": 0}
+        self.changed_at: Dict[str, float] = {}  # {"price_" / "market_state_": 最近一次内容变化的时间戳}
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, binance_service: Optional[BinanceService] = None) -> None:
+        """启动后台刷新任务（在应用startup事件中调用）"""
+        if self._tasks:
+            return
+        if binance_service is not None:
+            self.binance_service = binance_service
+        elif self.binance_service is None:
+            self.binance_service = BinanceService()
+        self._tasks = [
+            asyncio.create_task(self._run_aligned(PRICE_REFRESH_INTERVAL, 0, self.refresh_prices)),
+            asyncio.create_task(
+                self._run_aligned(MARKET_STATE_REFRESH_INTERVAL, CANDLE_CLOSE_DELAY, self.refresh_market_states)
+            ),
+        ]
+        logger.info("Market data refresher started")
+
+    async def stop(self) -> None:
+        """停止后台刷新任务（在应用shutdown事件中调用）"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Market data refresher stopped")
+
+    async def _run_aligned(self, interval: float, offset: float, job: Callable[[], Awaitable[None]]) -> None:
+        # 启动时先刷新一次，之后在每个边界时刻刷新
+        while True:
+            try:
+                await job()
+            except Exception as e:
+                logger.error(f"Market data refresh failed: {e}")
+            await asyncio.sleep(seconds_until_boundary(interval, offset))
+
+    async def refresh_prices(self) -> None:
+        self._expire_extra_symbols()
+        symbols = self.symbols + list(self.extra_symbols)
+        results = await self.binance_service.get_current_prices(
+            [f"{symbol}/USDT" for symbol in symbols], force=True
+        )
+        previous = {symbol: self.prices.get(symbol) for symbol in self.symbols}
+        for symbol in symbols:
+            self._store(self.prices, "price_", symbol, results.get(f"{symbol}/USDT"))
+        
+        # 只把发生变化的价格推送给看板连接
+        changed = {
+            symbol.lower(): self.prices[symbol]
+            for symbol in self.symbols
+            if symbol in self.prices and "error" not in self.prices[symbol] and self.prices[symbol] != previous[symbol]
+        }
+        if changed:
+            event_hub.publish("prices", {
+                "pricing": changed,
+                "updatedAt": self.freshness("price_", self.symbols)
+            })
+
+    async def refresh_market_states(self) -> None:
+        # 控制并发数量，避免触发API限制
+        semaphore = asyncio.Semaphore(3)
+
+        async def refresh(symbol):
+            async with semaphore:
+                result = await self.binance_service.get_current_market_state(f"{symbol}/USDT", force=True)
+            self._store(self.market_states, "market_state_", symbol, result)
+
+        await asyncio.gather(*[refresh(symbol) for symbol in self.symbols])
+
+    def _store(self, target: Dict[str, Dict[str, Any]], prefix: str, symbol: str, result: Optional[Dict[str, Any]]) -> None:
+        key = f"{prefix}{symbol}"
+        # 刷新失败时保留上一次成功的结果，只有还没有结果时才记录错误
+        if result is None:
+            result = {"error": "No result"}
+        if "error" in result:
+            logger.warning(f"Could not refresh {key}: {result['error']}")
+            if symbol in target and "error" not in target[symbol]:
+                return
+        else:
+            self.updated_at[key] = time.time()
+        if target.get(symbol) != result:
+            self.versions[prefix] += 1
+            self.changed_at[prefix] = time.time()
+        target[symbol] = result
+
+    def watch(self, symbols: List[str]) -> None:
+        """把请求中出现的额外交易对加入后台刷新列表（只接受交易所存在的交易对）"""
+        now = time.time()
+        self._expire_extra_symbols(now)
+        for symbol in symbols:
+            if symbol in self.symbols:
+                continue
+            if symbol in self.extra_symbols:
+                self.extra_symbols[symbol] = now
+                continue
+            if len(self.extra_symbols) >= MAX_EXTRA_SYMBOLS or not market_metadata.has_symbol(f"{symbol}/USDT"):
+                continue
+            self.extra_symbols[symbol] = now
+
+    def _expire_extra_symbols(self, now: Optional[float] = None) -> None:
+        """移除超过EXTRA_SYMBOL_TTL没有被请求的额外交易对及其价格"""
+        cutoff = (now or time.time()) - EXTRA_SYMBOL_TTL
+        for symbol in [symbol for symbol, requested_at in self.extra_symbols.items() if requested_at < cutoff]:
+            del self.extra_symbols[symbol]
+            self.prices.pop(symbol, None)
+            self.updated_at.pop(f"price_{symbol}", None)
+
+    def get_prices(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        self.watch(symbols)
+        return {
+            symbol: self.prices.get(symbol, {
+                "error": "Price not available yet"
+                if symbol in self.symbols or symbol in self.extra_symbols else "Symbol not tracked"
+            })
+            for symbol in symbols
+        }
+
+    def get_market_states(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {symbol: self.market_states.get(symbol, {"error": "Market state not available yet"}) for symbol in symbols}
+
+    def version(self, prefix: str, symbols: List[str]) -> str:
+        """这些交易对数据的版本标识：只由内容版本号决定，内容未变化的刷新不会改变版本（刷新时间见freshness）"""
+        return f"{self.versions[prefix]}:" + ",".join(symbols)
+
+    def last_changed(self, prefix: str) -> Optional[datetime]:
+        changed_at = self.changed_at.get(prefix)
+        return datetime.fromtimestamp(changed_at, timezone.utc) if changed_at else None
+
+    def freshness(self, prefix: str, symbols: List[str]) -> Optional[str]:
+        """返回这些交易对中最旧的一次成功刷新时间（ISO格式），没有任何数据时返回None"""
+        timestamps = [self.updated_at[f"{prefix}{symbol}"] for symbol in symbols if f"{prefix}{symbol}" in self.updated_at]
+        if not timestamps:
+            return None
+        return datetime.fromtimestamp(min(timestamps)).isoformat()
+
+
+market_data_refresher = MarketDataRefresher()
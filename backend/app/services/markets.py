@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import time
+import logging
+from typing import List, Optional
+from app.core.config import settings
+from app.services.exchange import get_exchange
+
+logger = logging.getLogger(__name__)
+
+# 市场元数据（交易对、精度、限制等）很少变化，每6小时刷新一次
+MARKETS_REFRESH_INTERVAL = 6 * 60 * 60
+# 本地文件超过这个时间就不再使用，启动时重新请求
+MARKETS_FILE_MAX_AGE = 24 * 60 * 60
+
+
+class MarketMetadata:
+    """共享交易所客户端的市场元数据：只加载一次，持久化到本地文件，后台定时刷新"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or settings.MARKETS_CACHE_FILE
+        self.loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task] = []
+
+    async def ensure_loaded(self) -> None:
+        """确保市场元数据已加载：优先使用内存，其次本地文件，最后才请求交易所"""
+        exchange = get_exchange()
+        if exchange.markets:
+            return
+        async with self._lock:
+            if exchange.markets:
+                return
+            if self._load_from_file():
+                # 从文件恢复时不会经过fetch_markets，需要单独同步服务器时间
+                if exchange.options.get('adjustForTimeDifference'):
+                    await exchange.load_time_difference()
+                return
+            await self._load_from_exchange()
+
+    def has_symbol(self, symbol: str) -> bool:
+        """交易对是否存在于已加载的市场中（元数据尚未加载时返回False）"""
+        return symbol in (get_exchange().markets or {})
+
+    async def refresh(self) -> None:
+        """重新请求市场元数据并写入本地文件"""
+        async with self._lock:
+            await self._load_from_exchange()
+
+    async def _load_from_exchange(self) -> None:
+        exchange = get_exchange()
+        await exchange.load_markets(reload=bool(exchange.markets))
+        self.loaded_at = time.time()
+        logger.info(f"Loaded {len(exchange.markets)} markets from exchange")
+        try:
+            self._save_to_file()
+        except Exception as e:
+            logger.warning(f"Could not save markets to {self.path}: {e}")
+
+    def _load_from_file(self) -> bool:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Could not read markets from {self.path}: {e}")
+            return False
+
+        saved_at = data.get("saved_at", 0)
+        if time.time() - saved_at > MARKETS_FILE_MAX_AGE or not data.get("markets"):
+            return False
+        get_exchange().set_markets(data["markets"], data.get("currencies"))
+        self.loaded_at = saved_at
+        logger.info(f"Loaded {len(data['markets'])} markets from {self.path}")
+        return True
+
+    def _save_to_file(self) -> None:
+        exchange = get_exchange()
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "saved_at": self.loaded_at,
+                "markets": exchange.markets,
+                "currencies": exchange.currencies,
+            }, f)
+        # 先写临时文件再替换，避免进程中断时留下不完整的文件
+        os.replace(tmp_path, self.path)
+
+    def start(self) -> None:
+        """启动时加载元数据并定时刷新（在应用startup事件中调用）"""
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._run())]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _run(self) -> None:
+        try:
+            await self.ensure_loaded()
+        except Exception as e:
+            logger.error(f"Could not load markets: {e}")
+        while True:
+            age = time.time() - self.loaded_at if self.loaded_at else MARKETS_REFRESH_INTERVAL
+            await asyncio.sleep(max(MARKETS_REFRESH_INTERVAL - age, 60))
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Could not refresh markets: {e}")
+
+
+market_metadata = MarketMetadata()
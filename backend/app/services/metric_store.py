@@ -0,0 +1,225 @@
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.trading import MetricPoint, MetricRollup
+from datetime import datetime, timedelta, timezone
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 默认模型名称（与交易决策使用的模型一致）
+DEFAULT_MODEL = "Deepseek"
+
+# 原始指标点的分辨率（采集间隔）
+RAW_RESOLUTION = "20s"
+# 聚合层级及每个时间桶的秒数，从细到粗
+ROLLUP_RESOLUTIONS = {"5m": 300, "1h": 3600, "1d": 86400}
+RESOLUTION_SECONDS = {RAW_RESOLUTION: 20, **ROLLUP_RESOLUTIONS}
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# 指标点和聚合时间桶的时间统一存储为无时区的UTC时间（与HTTP缓存头的处理一致）
+def utc_now() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def to_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """把请求中的时间转换为无时区的UTC时间；无时区的时间按UTC处理"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def isoformat_utc(value: Optional[datetime]) -> str:
+    """返回带UTC偏移的ISO格式，客户端不会把它当作本地时间"""
+    return value.replace(tzinfo=timezone.utc).isoformat() if value else ""
+
+
+def record_point(db: Session, account_info: Dict[str, Any], created_at: Optional[datetime] = None,
+                 model: str = DEFAULT_MODEL) -> MetricPoint:
+    """追加一个指标点并按保留策略删除过期的点（两者都走时间索引）"""
+    point = MetricPoint(
+        model=model,
+        created_at=created_at or utc_now(),
+        total_cash_value=account_info.get("totalCashValue", 0) or 0,
+        current_total_return=account_info.get("currentTotalReturn", 0) or 0,
+        available_cash=account_info.get("availableCash", 0) or 0,
+    )
+    db.add(point)
+    update_rollups(db, point)
+    prune(db, point.created_at, model)
+    db.commit()
+    return point
+
+
+def retention_days(resolution: str) -> Optional[int]:
+    """各层级的保留天数，None表示永久保留"""
+    if resolution == RAW_RESOLUTION:
+        return settings.METRICS_RETENTION_DAYS
+    if resolution == "5m":
+        return settings.METRICS_ROLLUP_5M_RETENTION_DAYS
+    if resolution == "1h":
+        return settings.METRICS_ROLLUP_1H_RETENTION_DAYS
+    return None
+
+
+def prune(db: Session, now: datetime, model: str = DEFAULT_MODEL) -> int:
+    """删除超过保留天数的指标点"""
+    cutoff = now - timedelta(days=retention_days(RAW_RESOLUTION))
+    return db.query(MetricPoint) \
+             .filter(MetricPoint.model == model, MetricPoint.created_at < cutoff) \
+             .delete(synchronize_session=False)
+
+
+def bucket_start(created_at: datetime, seconds: int) -> datetime:
+    """时间所在桶的起始时间（按整点对齐）"""
+    delta = created_at - _EPOCH
+    offset = (delta.days * 86400 + delta.seconds) % seconds
+    return created_at.replace(microsecond=0) - timedelta(seconds=offset)
+
+
+def _apply_point(rollup: MetricRollup, point: MetricPoint) -> None:
+    value, ret = point.total_cash_value, point.current_total_return
+    if not rollup.point_count:
+        rollup.open_value = rollup.high_value = rollup.low_value = value
+        rollup.min_return = rollup.max_return = ret
+    else:
+        rollup.high_value = max(rollup.high_value, value)
+        rollup.low_value = min(rollup.low_value, value)
+        rollup.min_return = min(rollup.min_return, ret)
+        rollup.max_return = max(rollup.max_return, ret)
+    rollup.close_value = value
+    rollup.close_return = ret
+    rollup.available_cash = point.available_cash
+    rollup.point_count = (rollup.point_count or 0) + 1
+    rollup.last_point_at = point.created_at
+
+
+def update_rollups(db: Session, point: MetricPoint) -> None:
+    """把新的指标点合并到各层级当前的时间桶中（每层一次索引查找）"""
+    # 新建的时间桶在_apply_point之前还没有填充，查询时不能被自动flush
+    with db.no_autoflush:
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            start = bucket_start(point.created_at, seconds)
+            rollup = db.query(MetricRollup).filter(
+                MetricRollup.model == point.model,
+                MetricRollup.resolution == resolution,
+                MetricRollup.bucket_start == start
+            ).first()
+            if rollup is None:
+                rollup = MetricRollup(model=point.model, resolution=resolution, bucket_start=start, point_count=0)
+                db.add(rollup)
+                # 每开一个新桶才清理一次该层级的过期数据
+                _prune_rollups(db, resolution, point.created_at, point.model)
+            _apply_point(rollup, point)
+
+
+def _prune_rollups(db: Session, resolution: str, now: datetime, model: str) -> int:
+    days = retention_days(resolution)
+    if days is None:
+        return 0
+    return db.query(MetricRollup) \
+             .filter(MetricRollup.model == model,
+                     MetricRollup.resolution == resolution,
+                     MetricRollup.bucket_start < now - timedelta(days=days)) \
+             .delete(synchronize_session=False)
+
+
+def rebuild_rollups(db: Session, model: str = DEFAULT_MODEL) -> int:
+    """根据现有的指标点重新生成所有聚合层级（用于迁移历史数据）"""
+    db.query(MetricRollup).filter(MetricRollup.model == model).delete(synchronize_session=False)
+    buckets: Dict[Any, MetricRollup] = {}
+    points = db.query(MetricPoint) \
+               .filter(MetricPoint.model == model) \
+               .order_by(MetricPoint.created_at.asc()) \
+               .yield_per(1000)
+    for point in points:
+        for resolution, seconds in ROLLUP_RESOLUTIONS.items():
+            key = (resolution, bucket_start(point.created_at, seconds))
+            rollup = buckets.get(key)
+            if rollup is None:
+                rollup = MetricRollup(model=model, resolution=resolution, bucket_start=key[1], point_count=0)
+                buckets[key] = rollup
+            _apply_point(rollup, point)
+    db.add_all(buckets.values())
+    db.commit()
+    return len(buckets)
+
+
+def choose_resolution(start: datetime, end: datetime, max_points: int, now: Optional[datetime] = None,
+                      max_rows: Optional[int] = None) -> str:
+    """选择时间范围的分辨率：点数仍不少于max_points（图表的点数）的最粗层级，都不足时选最细的层级
+
+    只考虑数据仍在保留期内、且读取的行数不超过max_rows的层级。
+    """
+    now = now or utc_now()
+    span = (end - start).total_seconds()
+    available = []
+    for resolution, seconds in RESOLUTION_SECONDS.items():
+        days = retention_days(resolution)
+        if days is not None and start < now - timedelta(days=days):
+            continue
+        if max_rows is not None and span / seconds > max_rows:
+            continue
+        available.append((resolution, span / seconds))
+    if not available:
+        return list(RESOLUTION_SECONDS)[-1]
+    filled = [resolution for resolution, count in available if count >= max_points]
+    return filled[-1] if filled else available[0][0]
+
+
+def query_points(db: Session, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                 limit: Optional[int] = None, model: str = DEFAULT_MODEL) -> List[MetricPoint]:
+    """按时间范围读取指标点（升序）；指定limit时返回范围内最新的limit个点"""
+    query = db.query(MetricPoint).filter(MetricPoint.model == model)
+    if start is not None:
+        query = query.filter(MetricPoint.created_at >= start)
+    if end is not None:
+        query = query.filter(MetricPoint.created_at <= end)
+    if limit is None:
+        return query.order_by(MetricPoint.created_at.asc()).all()
+    points = query.order_by(MetricPoint.created_at.desc()).limit(limit).all()
+    points.reverse()
+    return points
+
+
+def query_rollups(db: Session, resolution: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  limit: Optional[int] = None, model: str = DEFAULT_MODEL) -> List[MetricRollup]:
+    """按时间范围读取某个聚合层级的时间桶（升序）"""
+    query = db.query(MetricRollup).filter(MetricRollup.model == model, MetricRollup.resolution == resolution)
+    if start is not None:
+        query = query.filter(MetricRollup.bucket_start >= bucket_start(start, ROLLUP_RESOLUTIONS[resolution]))
+    if end is not None:
+        query = query.filter(MetricRollup.bucket_start <= end)
+    if limit is None:
+        return query.order_by(MetricRollup.bucket_start.asc()).all()
+    rollups = query.order_by(MetricRollup.bucket_start.desc()).limit(limit).all()
+    rollups.reverse()
+    return rollups
+
+
+def serialize_point(point: MetricPoint) -> Dict[str, Any]:
+    """指标点的返回格式（与原来JSON列表中的字段一致）"""
+    return {
+        "totalCashValue": point.total_cash_value,
+        "currentTotalReturn": point.current_total_return,
+        "availableCash": point.available_cash,
+        "createdAt": isoformat_utc(point.created_at),
+    }
+
+
+def serialize_rollup(rollup: MetricRollup) -> Dict[str, Any]:
+    """时间桶的返回格式：与指标点字段一致（取收盘值），并附带OHLC和收益率范围"""
+    return {
+        "totalCashValue": rollup.close_value,
+        "currentTotalReturn": rollup.close_return,
+        "availableCash": rollup.available_cash,
+        "createdAt": isoformat_utc(rollup.bucket_start),
+        "open": rollup.open_value,
+        "high": rollup.high_value,
+        "low": rollup.low_value,
+        "minReturn": rollup.min_return,
+        "maxReturn": rollup.max_return,
+        "count": rollup.point_count,
+    }
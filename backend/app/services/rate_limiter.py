@@ -0,0 +1,153 @@
+import ccxt
+import asyncio
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Binance U本位合约每个IP每分钟的请求权重上限
+REQUEST_WEIGHT_LIMIT = 2400
+WEIGHT_WINDOW = 60
+# 只留给高优先级请求（下单、持仓、账户）的权重
+HIGH_PRIORITY_RESERVE = 600
+# 低优先级请求最多排队等待的秒数，超过则直接放弃
+LOW_PRIORITY_MAX_WAIT = 5
+
+PRIORITY_HIGH = "high"
+PRIORITY_LOW = "low"
+
+# 只有合约接口计入权重预算，现货等接口使用Binance的其他额度
+_SCHEDULED_API_PREFIX = "fapi"
+_USED_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+
+_priority_override: ContextVar[Optional[str]] = ContextVar("request_priority", default=None)
+
+
+class RequestShed(ccxt.RateLimitExceeded):
+    """低优先级请求因权重预算不足被放弃"""
+    pass
+
+
+@contextmanager
+def request_priority(priority: str) -> Iterator[None]:
+    """在这个上下文中发出的交易所请求使用指定优先级"""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+class WeightScheduler:
+    """进程内共享的请求权重调度器
+
+    按滑动窗口统计已用权重，并以交易所返回的已用权重为准进行校正。低优先级请求不能占用
+    为高优先级请求保留的额度，预算不足时短暂排队，等待过久则被放弃。
+    """
+
+    def __init__(self, limit: float = REQUEST_WEIGHT_LIMIT, window: float = WEIGHT_WINDOW,
+                 reserve: float = HIGH_PRIORITY_RESERVE, max_wait: float = LOW_PRIORITY_MAX_WAIT):
+        self.limit = limit
+        self.window = window
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._spent: Deque[Tuple[float, float]] = deque()  # [(时间戳, 权重)]
+        self._spent_total = 0.0
+        self._server_used: Optional[Tuple[int, float]] = None  # (分钟序号, 交易所返回的已用权重)
+        self._high_waiting = 0
+        self.stats: Dict[str, Dict[str, float]] = {
+            priority: {"requests": 0, "weight": 0, "waited": 0, "shed": 0}
+            for priority in (PRIORITY_HIGH, PRIORITY_LOW)
+        }
+
+    def is_scheduled(self, api: Any) -> bool:
+        return isinstance(api, str) and api.startswith(_SCHEDULED_API_PREFIX)
+
+    def priority_for(self, api: str) -> str:
+        """未显式指定时，私有接口（下单、持仓、账户）为高优先级，行情接口为低优先级"""
+        override = _priority_override.get()
+        if override is not None:
+            return override
+        return PRIORITY_HIGH if "Private" in api else PRIORITY_LOW
+
+    def used(self, now: Optional[float] = None) -> float:
+        """当前窗口内已用的权重"""
+        now = time.time() if now is None else now
+        while self._spent and self._spent[0][0] <= now - self.window:
+            self._spent_total -= self._spent.popleft()[1]
+        used = self._spent_total
+        # 交易所按整分钟统计，同一分钟内以较大的值为准
+        if self._server_used is not None and self._server_used[0] == int(now // 60):
+            used = max(used, self._server_used[1])
+        return used
+
+    def _wait_time(self, now: float) -> float:
+        """最早一笔权重移出窗口（或交易所进入下一分钟）还需要的秒数"""
+        candidates = [60 - now % 60]
+        if self._spent:
+            candidates.append(self._spent[0][0] + self.window - now)
+        return max(min(candidates), 0.05)
+
+    async def acquire(self, weight: float, priority: str) -> None:
+        """为一次请求申请权重，预算不足时等待；低优先级请求等待过久会抛出RequestShed"""
+        high = priority == PRIORITY_HIGH
+        start = time.time()
+        if high:
+            self._high_waiting += 1
+        try:
+            while True:
+                now = time.time()
+                available = self.limit - self.used(now) - (0 if high else self.reserve)
+                # 有高优先级请求在排队时，低优先级请求让路
+                if weight <= available and (high or self._high_waiting == 0):
+                    break
+                # 预算足够、只是在给排队的高优先级请求让路时，短暂等待即可
+                wait = self._wait_time(now) if weight > available else 0.05
+                if not high and now + wait - start > self.max_wait:
+                    self.stats[priority]["shed"] += 1
+                    logger.warning(f"Shedding low priority request (weight {weight}), budget {self.used(now)}/{self.limit}")
+                    raise RequestShed(f"Request weight budget exhausted ({self.used(now):.0f}/{self.limit})")
+                await asyncio.sleep(min(wait, 1))
+        finally:
+            if high:
+                self._high_waiting -= 1
+
+        now = time.time()
+        if now - start > 0.001:
+            self.stats[priority]["waited"] += 1
+        self.stats[priority]["requests"] += 1
+        self.stats[priority]["weight"] += weight
+        self._spent.append((now, weight))
+        self._spent_total += weight
+
+    def observe_headers(self, headers: Optional[Dict[str, Any]]) -> None:
+        """用交易所响应头中的已用权重校正本地统计"""
+        if not headers:
+            return
+        for key, value in headers.items():
+            if key.lower() == _USED_WEIGHT_HEADER:
+                try:
+                    self._server_used = (int(time.time() // 60), float(value))
+                except (TypeError, ValueError):
+                    pass
+                return
+
+    def get_usage(self) -> Dict[str, Any]:
+        """当前权重预算使用情况"""
+        used = self.used()
+        return {
+            "used": used,
+            "limit": self.limit,
+            "reserved_for_high_priority": self.reserve,
+            "available_for_low_priority": max(self.limit - self.reserve - used, 0),
+            "server_used": self._server_used[1] if self._server_used else None,
+            "high_priority_waiting": self._high_waiting,
+            "by_priority": self.stats,
+        }
+
+
+request_scheduler = WeightScheduler()
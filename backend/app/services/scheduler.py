@@ -0,0 +1,50 @@
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.interval import IntervalTrigger
+import logging
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+
+class JobScheduler:
+    """进程内的定时任务调度，替代外部crontab通过HTTP调用 /api/cron/*
+
+    每个任务同时最多运行一个实例；错过的多次执行合并为一次。
+    """
+
+    def __init__(self):
+        self._jobs: List[Tuple[str, Job, int, int]] = []
+        self._scheduler: Optional[AsyncIOScheduler] = None
+
+    def add_job(self, job_id: str, func: Job, interval: int, jitter: int = 0) -> None:
+        """注册一个固定间隔（秒）执行的任务，需在start之前调用；同名任务会被替换"""
+        self._jobs = [job for job in self._jobs if job[0] != job_id]
+        self._jobs.append((job_id, func, interval, jitter))
+
+    def start(self) -> None:
+        """启动调度器（在应用startup事件中调用）"""
+        if self._scheduler is not None:
+            return
+        self._scheduler = AsyncIOScheduler()
+        for job_id, func, interval, jitter in self._jobs:
+            self._scheduler.add_job(
+                func,
+                IntervalTrigger(seconds=interval, jitter=jitter or None),
+                id=job_id,
+                max_instances=1,
+                coalesce=True,
+                misfire_grace_time=interval,
+                replace_existing=True,
+            )
+        self._scheduler.start()
+        logger.info(f"Scheduler started with jobs: {[job[0] for job in self._jobs]}")
+
+    def stop(self) -> None:
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+
+
+job_scheduler = JobScheduler()
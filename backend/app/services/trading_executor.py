@@ -1,47 +1,49 @@
-import ccxt
+import asyncio
 import json
 import logging
-from app.core.config import settings
 from typing import Dict, Any, Optional
 from app.models.trading import Trading
 from app.core.database import get_db
+from app.services.exchange import get_exchange
+from app.services.markets import market_metadata
+from app.services.binance_service import pricing_cache
+from app.services.rate_limiter import PRIORITY_HIGH, request_priority
 
 logger = logging.getLogger(__name__)
 
 
 class TradingExecutor:
     def __init__(self):
-        # 初始化Binance交易所连接，使用合约交易
-        self.exchange = ccxt.binance({
-            'apiKey': settings.BINANCE_API_KEY,
-            'secret': settings.BINANCE_API_SECRET,
-            'options': {
-                'defaultType': 'future',  # 使用合约交易
-            },
-            'enableRateLimit': True,
-        })
+        # 使用进程内共享的异步交易所客户端（合约交易）
+        self.exchange = get_exchange()
         # Binance要求订单的名义价值至少为5 USDT
         self.MIN_NOTIONAL_VALUE = 5.0
 
-    def execute_trade(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
+    async def execute_trade(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
         """
         根据AI决策执行交易
         """
         try:
-            recommendation = decision.get("recommendation", "").upper()
-            
-            if recommendation == "BUY":
-                return self._execute_buy(symbol, decision, chat_id)
-            elif recommendation == "SELL":
-                return self._execute_sell(symbol, decision, chat_id)
-            elif recommendation == "HOLD":
-                # 即使是HOLD决策，也可以根据需要强制执行某些操作
-                return self._execute_hold(symbol, decision, chat_id)
-            else:
-                return {
-                    "status": "skipped",
-                    "message": f"Unknown recommendation: {recommendation}"
-                }
+            # 下单路径上的所有请求（包括行情和市场信息）都优先于看板行情请求
+            with request_priority(PRIORITY_HIGH):
+                recommendation = decision.get("recommendation", "").upper()
+                
+                if recommendation == "BUY":
+                    result = await self._execute_buy(symbol, decision, chat_id)
+                elif recommendation == "SELL":
+                    result = await self._execute_sell(symbol, decision, chat_id)
+                elif recommendation == "HOLD":
+                    # 即使是HOLD决策，也可以根据需要强制执行某些操作
+                    return await self._execute_hold(symbol, decision, chat_id)
+                else:
+                    return {
+                        "status": "skipped",
+                        "message": f"Unknown recommendation: {recommendation}"
+                    }
+                
+                # 下单后余额和持仓已变化，清除缓存的账户信息
+                pricing_cache.invalidate("account_")
+                return result
         except Exception as e:
             logger.error(f"Error executing trade: {str(e)}")
             return {
@@ -49,11 +51,11 @@ class TradingExecutor:
                 "message": str(e)
             }
 
-    def _get_position_info(self, symbol: str) -> Dict[str, Any]:
+    async def _get_position_info(self, symbol: str) -> Dict[str, Any]:
         """获取当前持仓信息"""
         try:
             # 获取持仓信息
-            positions = self.exchange.fetch_positions([symbol])
+            positions = await self.exchange.fetch_positions([symbol])
             # 过滤出当前交易对的持仓
             symbol_positions = [p for p in positions if p['symbol'] == symbol]
             if symbol_positions:
@@ -63,27 +65,27 @@ class TradingExecutor:
             logger.error(f"Error fetching position info: {str(e)}")
             return {}
 
-    def _set_leverage(self, symbol: str, leverage: int = 5):
+    async def _set_leverage(self, symbol: str, leverage: int = 5):
         """设置杠杆"""
         try:
             # 使用正确的API方法设置杠杆
             # 对于期货合约，使用futures API
             if hasattr(self.exchange, 'fapiPrivate_post_leverage'):
-                self.exchange.fapiPrivate_post_leverage({
+                await self.exchange.fapiPrivate_post_leverage({
                     'symbol': symbol.replace('/', ''),
                     'leverage': leverage
                 })
             elif hasattr(self.exchange, 'dapiPrivate_post_leverage'):
-                self.exchange.dapiPrivate_post_leverage({
+                await self.exchange.dapiPrivate_post_leverage({
                     'symbol': symbol.replace('/', ''),
                     'leverage': leverage
                 })
             else:
-                # 尝试使用通用方法
-                self.exchange.load_markets()
+                # 尝试使用通用方法（市场元数据已加载时不会再请求交易所）
+                await market_metadata.ensure_loaded()
                 market = self.exchange.market(symbol)
                 if hasattr(self.exchange, 'set_leverage'):
-                    self.exchange.set_leverage(leverage, symbol)
+                    await self.exchange.set_leverage(leverage, symbol)
             logger.info(f"Leverage set to {leverage}x for {symbol}")
         except Exception as e:
             logger.warning(f"Failed to set leverage for {symbol}: {str(e)}")
@@ -91,7 +93,7 @@ class TradingExecutor:
     def _save_trade_to_db(self, symbol: str, operation: str, amount: float, price: float, 
                          leverage: Optional[int] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None,
                          chat_id: Optional[str] = None):
-        """保存交易记录到数据库"""
+        """保存交易记录到数据库（同步的数据库写入，调用方通过asyncio.to_thread在线程中执行）"""
         db = None
         try:
             # 获取数据库会话
@@ -133,20 +135,20 @@ class TradingExecutor:
                 except:
                     pass
 
-    def _execute_buy(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
+    async def _execute_buy(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
         """执行买入交易"""
         try:
             # 获取当前持仓信息
-            position_info = self._get_position_info(symbol)
+            position_info = await self._get_position_info(symbol)
             position_amount = position_info.get('contracts', 0) if position_info else 0
             side = position_info.get('side', '') if position_info else ''
             
             # 获取账户余额
-            balance = self.exchange.fetch_balance()
+            balance = await self.exchange.fetch_balance()
             usdt_balance = balance['USDT']['free'] if 'USDT' in balance else 0
             
             # 设置5倍杠杆
-            self._set_leverage(symbol, 5)
+            await self._set_leverage(symbol, 5)
             
             # 根据当前持仓情况决定操作
             if position_amount == 0:
@@ -161,7 +163,7 @@ class TradingExecutor:
                 entry_price = decision.get("target_entry_price") or decision.get("entry_price", 0)
                 if not entry_price or entry_price <= 0:
                     # 如果没有指定入场价，使用当前市场价格
-                    ticker = self.exchange.fetch_ticker(symbol)
+                    ticker = await self.exchange.fetch_ticker(symbol)
                     entry_price = ticker['last']
                 
                 # 确保entry_price不是None且大于0
@@ -191,10 +193,11 @@ class TradingExecutor:
                 amount = (amount_to_spend * 5) / entry_price
                 
                 # 创建买入订单
-                order = self.exchange.create_market_buy_order(symbol, amount)
+                order = await self.exchange.create_market_buy_order(symbol, amount)
                 
                 # 保存交易记录到数据库
-                self._save_trade_to_db(
+                await asyncio.to_thread(
+                    self._save_trade_to_db,
                     symbol=symbol,
                     operation="BUY",
                     amount=amount,
@@ -216,10 +219,11 @@ class TradingExecutor:
             elif position_amount > 0 and side == 'short':
                 # 当前持有空头仓位，需要平空
                 # 平仓数量为当前持仓数量
-                order = self.exchange.create_market_buy_order(symbol, abs(position_amount))
+                order = await self.exchange.create_market_buy_order(symbol, abs(position_amount))
                 
                 # 保存交易记录到数据库
-                self._save_trade_to_db(
+                await asyncio.to_thread(
+                    self._save_trade_to_db,
                     symbol=symbol,
                     operation="BUY",
                     amount=abs(position_amount),
@@ -238,10 +242,11 @@ class TradingExecutor:
             elif position_amount < 0 and side == 'short':
                 # 当前持有空头仓位，需要平空
                 # 平仓数量为当前持仓数量
-                order = self.exchange.create_market_buy_order(symbol, abs(position_amount))
+                order = await self.exchange.create_market_buy_order(symbol, abs(position_amount))
                 
                 # 保存交易记录到数据库
-                self._save_trade_to_db(
+                await asyncio.to_thread(
+                    self._save_trade_to_db,
                     symbol=symbol,
                     operation="BUY",
                     amount=abs(position_amount),
@@ -271,20 +276,20 @@ class TradingExecutor:
                 "message": f"Failed to execute BUY order: {str(e)}"
             }
 
-    def _execute_sell(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
+    async def _execute_sell(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
         """执行卖出交易"""
         try:
             # 获取当前持仓信息
-            position_info = self._get_position_info(symbol)
+            position_info = await self._get_position_info(symbol)
             position_amount = position_info.get('contracts', 0) if position_info else 0
             side = position_info.get('side', '') if position_info else ''
             
             # 获取账户余额
-            balance = self.exchange.fetch_balance()
+            balance = await self.exchange.fetch_balance()
             usdt_balance = balance['USDT']['free'] if 'USDT' in balance else 0
             
             # 设置5倍杠杆
-            self._set_leverage(symbol, 5)
+            await self._set_leverage(symbol, 5)
             
             # 根据当前持仓情况决定操作
             if position_amount == 0:
@@ -299,7 +304,7 @@ class TradingExecutor:
                 entry_price = decision.get("target_entry_price") or decision.get("entry_price", 0)
                 if not entry_price or entry_price <= 0:
                     # 如果没有指定入场价，使用当前市场价格
-                    ticker = self.exchange.fetch_ticker(symbol)
+                    ticker = await self.exchange.fetch_ticker(symbol)
                     entry_price = ticker['last']
                 
                 # 确保entry_price不是None且大于0
@@ -329,10 +334,11 @@ class TradingExecutor:
                 amount = (amount_to_spend * 5) / entry_price
                 
                 # 创建卖出订单
-                order = self.exchange.create_market_sell_order(symbol, amount)
+                order = await self.exchange.create_market_sell_order(symbol, amount)
                 
                 # 保存交易记录到数据库
-                self._save_trade_to_db(
+                await asyncio.to_thread(
+                    self._save_trade_to_db,
                     symbol=symbol,
                     operation="SELL",
                     amount=amount,
@@ -354,10 +360,11 @@ class TradingExecutor:
             elif position_amount > 0 and side == 'long':
                 # 当前持有多头仓位，需要平多
                 # 平仓数量为当前持仓数量
-                order = self.exchange.create_market_sell_order(symbol, position_amount)
+                order = await self.exchange.create_market_sell_order(symbol, position_amount)
                 
                 # 保存交易记录到数据库
-                self._save_trade_to_db(
+                await asyncio.to_thread(
+                    self._save_trade_to_db,
                     symbol=symbol,
                     operation="SELL",
                     amount=position_amount,
@@ -394,7 +401,7 @@ class TradingExecutor:
                 "message": f"Failed to execute SELL order: {str(e)}"
             }
 
-    def _execute_hold(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
+    async def _execute_hold(self, symbol: str, decision: Dict[str, Any], chat_id: Optional[str] = None) -> Dict[str, Any]:
         """执行持有操作（可以用于其他操作，如调整止损等）"""
         # 在HOLD情况下，我们通常不执行任何交易
         # 但可以根据需要实现其他逻辑，如调整现有仓位的止损等
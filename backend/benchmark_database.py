@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# SQLite并发读写基准：对比原引擎配置（默认日志模式 + pool_pre_ping）和当前的SQLite配置（WAL + pragmas）
+# 用法: python benchmark_database.py [秒数] [读线程数]
+
+import sys
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+# 将项目根目录添加到Python路径中
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, create_database_engine
+from app.models.trading import MetricPoint
+from app.services import metric_store
+
+
+def legacy_engine(url):
+    """原来的引擎配置"""
+    return create_engine(
+        url,
+        connect_args={"check_same_thread": False},
+        pool_pre_ping=True,
+        pool_recycle=300
+    )
+
+
+def run_benchmark(name, engine, duration, readers):
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    # 预先写入一天的指标点
+    db = Session()
+    start = datetime.now() - timedelta(days=1)
+    db.add_all([
+        MetricPoint(created_at=start + timedelta(seconds=20 * i), total_cash_value=100 + i % 7,
+                    current_total_return=0.01, available_cash=50)
+        for i in range(4320)
+    ])
+    db.commit()
+    db.close()
+
+    stop = time.time() + duration
+    lock = threading.Lock()
+    stats = {"reads": 0, "writes": 0, "errors": 0, "read_latencies": []}
+
+    def reader():
+        while time.time() < stop:
+            db = Session()
+            began = time.perf_counter()
+            try:
+                metric_store.query_points(db, limit=150)
+                metric_store.query_points(db, start=start, end=start + timedelta(hours=1))
+                with lock:
+                    stats["reads"] += 1
+                    stats["read_latencies"].append(time.perf_counter() - began)
+            except Exception:
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                db.close()
+
+    def writer():
+        while time.time() < stop:
+            db = Session()
+            try:
+                metric_store.record_point(db, {"totalCashValue": 100, "currentTotalReturn": 0.01,
+                                               "availableCash": 50})
+                with lock:
+                    stats["writes"] += 1
+            except Exception:
+                db.rollback()
+                with lock:
+                    stats["errors"] += 1
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)] + [threading.Thread(target=writer)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    latencies = sorted(stats["read_latencies"]) or [0]
+    p95 = latencies[int(len(latencies) * 0.95) - 1 if len(latencies) > 1 else 0]
+    print(f"{name:8s} 读: {stats['reads'] / duration:8.1f}/s  写: {stats['writes'] / duration:8.1f}/s  "
+          f"读p95: {p95 * 1000:7.2f}ms  错误: {stats['errors']}")
+
+
+if __name__ == "__main__":
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+    readers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    with tempfile.TemporaryDirectory() as tmp:
+        run_benchmark("原配置", legacy_engine(f"sqlite:///{tmp}/legacy.db"), duration, readers)
+        run_benchmark("WAL配置", create_database_engine(f"sqlite:///{tmp}/tuned.db"), duration, readers)
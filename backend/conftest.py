@@ -0,0 +1,26 @@
+import os
+
+# 测试只使用内存数据库，不需要真实的密钥（必须在导入app之前设置）
+for key in ("BINANCE_API_KEY", "BINANCE_API_SECRET", "DEEPSEEK_API_KEY", "CRON_SECRET_KEY"):
+    os.environ.setdefault(key, "test")
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+
+@pytest.fixture
+def db_session():
+    """每个测试使用独立的内存SQLite数据库（默认的autoflush会话）"""
+    from app.core.database import Base
+    import app.models.trading  # noqa: F401  注册所有表
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        yield db
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# 一次性迁移：为已有的聊天记录预解析决策，填充decision/recommendation/risk_level列
+
+import sys
+import os
+
+# 将项目根目录添加到Python路径中
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal
+from app.models.trading import Chat
+from app.api.trading import chat_decision_columns
+from sqlalchemy.orm import load_only
+from migrate_schema import migrate_schema
+
+BATCH_SIZE = 500
+
+def migrate_chat_decisions():
+    # 先为已有的chats表补上decision/recommendation/risk_level列
+    migrate_schema()
+    db = SessionLocal()
+    try:
+        migrated = 0
+        while True:
+            chats = db.query(Chat).options(load_only(Chat.id, Chat.chat)) \
+                      .filter(Chat.decision.is_(None)) \
+                      .limit(BATCH_SIZE).all()
+            if not chats:
+                break
+            for chat in chats:
+                for column, value in chat_decision_columns(chat.chat).items():
+                    setattr(chat, column, value)
+            db.commit()
+            migrated += len(chats)
+        print(f"迁移聊天记录数: {migrated}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_chat_decisions()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# 一次性迁移：把已有聊天记录的提示词和决策改为压缩存储，提示词中的重复子文档只保存一份
+
+import sys
+import os
+
+# 将项目根目录添加到Python路径中
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+from sqlalchemy.orm.attributes import flag_modified
+from app.core.database import SessionLocal, engine
+from app.models.trading import Base, Chat, ContentBlob
+
+BATCH_SIZE = 200
+
+def migrate_chat_prompts():
+    Base.metadata.create_all(bind=engine, tables=[ContentBlob.__table__])
+    db = SessionLocal()
+    try:
+        migrated = 0
+        last_id = ""
+        while True:
+            chats = db.query(Chat).filter(Chat.id > last_id).order_by(Chat.id).limit(BATCH_SIZE).all()
+            if not chats:
+                break
+            for chat in chats:
+                # 重新赋值即可按新格式写回（已迁移过的行内容不变）
+                chat.user_prompt = chat.user_prompt
+                flag_modified(chat, "chat")
+            last_id = chats[-1].id
+            db.commit()
+            db.expunge_all()
+            migrated += len(chats)
+        blob_count = db.query(ContentBlob).count()
+        print(f"迁移聊天记录数: {migrated}, 子文档数: {blob_count}")
+    finally:
+        db.close()
+
+    # 回收旧的未压缩数据占用的空间
+    with engine.connect() as connection:
+        connection.execute(text("VACUUM"))
+    print("VACUUM 完成")
+
+if __name__ == "__main__":
+    migrate_chat_prompts()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# 一次性迁移：把metrics表中JSON列表形式的历史指标写入metric_points表，并生成聚合层级
+
+import sys
+import os
+from datetime import datetime, timezone
+
+# 将项目根目录添加到Python路径中
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.database import SessionLocal, engine
+from app.models.trading import Base, Metrics, MetricPoint, MetricRollup
+from app.services.metric_store import rebuild_rollups
+
+def migrate_metrics():
+    # 确保新表和索引存在
+    Base.metadata.create_all(bind=engine, tables=[MetricPoint.__table__, MetricRollup.__table__])
+    db = SessionLocal()
+    try:
+        migrated = 0
+        for row in db.query(Metrics).all():
+            # 已经迁移过的时间点不再重复写入
+            existing = {
+                created_at for (created_at,) in
+                db.query(MetricPoint.created_at).filter(MetricPoint.model == row.model).all()
+            }
+            for metric in row.metrics or []:
+                if not isinstance(metric, dict) or not metric.get("createdAt"):
+                    continue
+                # 旧数据的createdAt是服务器本地时间，统一转换为UTC存储
+                created_at = datetime.fromisoformat(metric["createdAt"]).astimezone(timezone.utc).replace(tzinfo=None)
+                if created_at in existing:
+                    continue
+                account_info = metric.get("accountInformationAndPerformance", {})
+                db.add(MetricPoint(
+                    model=row.model,
+                    created_at=created_at,
+                    total_cash_value=account_info.get("totalCashValue", 0) or 0,
+                    current_total_return=account_info.get("currentTotalReturn", 0) or 0,
+                    available_cash=account_info.get("availableCash", 0) or 0,
+                ))
+                migrated += 1
+        db.commit()
+        print(f"迁移指标点数: {migrated}")
+        for model in {row.model for row in db.query(Metrics).all()}:
+            print(f"{model} 聚合时间桶数: {rebuild_rollups(db, model)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_metrics()
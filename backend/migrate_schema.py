@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# 一次性迁移：create_all不会修改已存在的表，这里为已有的表补上新增的可空列和索引
+
+import sys
+import os
+
+# 将项目根目录添加到Python路径中
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import inspect, text
+from app.core.database import engine
+from app.models.trading import Base
+
+def migrate_schema():
+    Base.metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns and column.nullable:
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+                    ))
+                print(f"新增列: {table.name}.{column.name}")
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    print("数据库结构迁移完成")
+
+if __name__ == "__main__":
+    migrate_schema()
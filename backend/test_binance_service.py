@@ -4,6 +4,7 @@ import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.services.binance_service import BinanceService
+from app.services.exchange import close_exchange
 
 async def test_binance_service():
     """测试修改后的Binance服务"""
@@ -26,6 +27,8 @@ async def test_binance_service():
     except Exception as e:
         print(f"Error testing Binance service: {e}")
         return False
+    finally:
+        await close_exchange()
 
 if __name__ == "__main__":
     success = asyncio.run(test_binance_service())
@@ -0,0 +1,135 @@
+import asyncio
+import pytest
+from app.core.cache import CacheNamespace, LRUCache
+
+
+def test_coalesce_runs_one_fetch_for_concurrent_callers():
+    async def run():
+        cache = LRUCache()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetcher():
+            calls.append(1)
+            await release.wait()
+            return 42
+
+        callers = [asyncio.create_task(cache.coalesce("ticker:DOGE", fetcher)) for _ in range(5)]
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*callers), calls, cache
+
+    results, calls, cache = asyncio.run(run())
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert cache.stats["fetches"] == 1 and cache.stats["coalesced"] == 4
+    assert not cache._inflight
+
+
+def test_coalesce_propagates_errors_to_every_caller():
+    async def run():
+        cache = LRUCache()
+        release = asyncio.Event()
+
+        async def fetcher():
+            await release.wait()
+            raise ValueError("exchange down")
+
+        callers = [asyncio.create_task(cache.coalesce("ticker:DOGE", fetcher)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        # 失败的请求不会留在进行中列表里，下一次调用重新发起
+        retry = await cache.coalesce("ticker:DOGE", lambda: asyncio.sleep(0, result="ok"))
+        return results, retry
+
+    results, retry = asyncio.run(run())
+    assert all(isinstance(result, ValueError) and str(result) == "exchange down" for result in results)
+    assert retry == "ok"
+
+
+def test_cancelled_owner_does_not_cancel_waiters():
+    async def run():
+        cache = LRUCache()
+        release = asyncio.Event()
+
+        async def fetcher():
+            await release.wait()
+            return 42
+
+        owner = asyncio.create_task(cache.coalesce("ticker:DOGE", fetcher))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(cache.coalesce("ticker:DOGE", fetcher))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await owner
+        return await waiter
+
+    assert asyncio.run(run()) == 42
+
+
+def test_stale_value_is_served_while_refreshing():
+    async def run():
+        cache = LRUCache(ttl=60, stale_ttl=60)
+        # ttl为负数：立即过了新鲜期，但仍在旧值期限内
+        cache.set("ticker:DOGE", "old", ttl=-1)
+        release = asyncio.Event()
+
+        async def fetcher():
+            await release.wait()
+            return "new"
+
+        first = await cache.get_or_fetch("ticker:DOGE", fetcher)
+        # 刷新进行中时不会重复发起请求
+        second = await cache.get_or_fetch("ticker:DOGE", fetcher)
+        release.set()
+        await asyncio.gather(*cache._refreshing)
+        return first, second, cache.get("ticker:DOGE"), cache
+
+    first, second, refreshed, cache = asyncio.run(run())
+    assert (first, second, refreshed) == ("old", "old", "new")
+    assert cache.stats["stale_hits"] == 2 and cache.stats["fetches"] == 1
+
+
+def test_failed_refresh_keeps_stale_value():
+    async def run():
+        cache = LRUCache(ttl=60, stale_ttl=60)
+        cache.set("ticker:DOGE", "old", ttl=-1)
+
+        async def fetcher():
+            raise ValueError("exchange down")
+
+        value = await cache.get_or_fetch("ticker:DOGE", fetcher)
+        await asyncio.gather(*cache._refreshing)
+        return value, cache.lookup("ticker:DOGE"), cache
+
+    value, (stale, fresh), cache = asyncio.run(run())
+    assert value == stale == "old" and not fresh
+    assert cache.stats["refresh_errors"] == 1
+
+
+def test_expired_value_is_not_served():
+    cache = LRUCache(ttl=60, stale_ttl=0, namespaces={"markets:": CacheNamespace(ttl=3600, stale_ttl=60)})
+    cache.set("ticker:DOGE", "old", ttl=-1)
+    assert cache.lookup("ticker:DOGE") == (None, False)
+    assert cache.stats["expirations"] == 1
+    # 命名空间按最长前缀匹配
+    assert cache.namespace("markets:all").ttl == 3600
+    assert cache.namespace("ticker:DOGE") is cache.default
+
+
+def test_lru_eviction_counters():
+    cache = LRUCache(ttl=60, maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # a变为最近访问
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    stats = cache.get_stats()
+    assert stats["evictions"] == 1 and stats["size"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 1)
+    assert stats["hit_rate"] == 0.75
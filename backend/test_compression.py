@@ -0,0 +1,84 @@
+import json
+import pytest
+from app.core.compression import (
+    BLOB_REF_KEY, MANIFEST_PREFIX, MIN_BLOB_SIZE, join_document, split_document
+)
+
+
+def make_prompt(seed):
+    """与交易决策的user_prompt结构相同：市场状态（含较长的指标序列）和账户信息"""
+    return json.dumps({
+        "market_state": {
+            "current_price": 0.1 + seed / 1000,
+            "intraday": {"ema_20": [0.1 + i / 1e4 for i in range(60)], "rsi_7": [50 + i % 7 for i in range(60)]},
+            "long_term_context": {"macd": [round(i * 0.37, 4) for i in range(80)], "atr_14": 0.0123},
+            **{f"open_interest_{i}": 1000 + i for i in range(40)},
+        },
+        "account_info": {"totalCashValue": 30 + seed, "positions": [{"symbol": "DOGE/USDT", "amount": 100}]},
+        "note": "中文和 unicode ✓",
+    })
+
+
+def store(text, blob_store):
+    manifest, blobs = split_document(text)
+    blob_store.update(blobs)
+    return manifest
+
+
+def fetcher(blob_store, calls=None):
+    def fetch(hashes):
+        if calls is not None:
+            calls.append(set(hashes))
+        return {digest: blob_store[digest] for digest in hashes if digest in blob_store}
+    return fetch
+
+
+def test_round_trip_is_byte_for_byte():
+    blob_store = {}
+    for seed in range(3):
+        text = make_prompt(seed)
+        manifest = store(text, blob_store)
+        assert manifest.startswith(MANIFEST_PREFIX)
+        assert len(manifest) < len(text)
+        assert join_document(manifest, fetcher(blob_store)) == text
+    # 每次的市场状态（价格不同）各存一份，未变化的指标序列只存一份
+    assert len(blob_store) == 3 + 2
+    assert all(len(blob) >= MIN_BLOB_SIZE for blob in blob_store.values())
+
+
+def test_nested_blobs_are_fetched_level_by_level():
+    blob_store, calls = {}, []
+    text = make_prompt(0)
+    manifest = store(text, blob_store)
+    # market_state本身和其中较大的子文档都被拆分，嵌套引用需要第二次读取
+    assert BLOB_REF_KEY in blob_store[json.loads(manifest)["$manifest"]["market_state"][BLOB_REF_KEY]]
+    assert join_document(manifest, fetcher(blob_store, calls)) == text
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("text", [
+    "plain text",
+    "[1, 2, 3]",
+    '{"a":1}',  # 非json.dumps默认格式，拆分后无法无损还原
+    json.dumps({"small": {"a": 1}}),
+    json.dumps({"$manifest": {"a": 1}}),  # 原文恰好以清单标记开头
+    '{"$manifest" is not json',
+])
+def test_unsplit_text_round_trips_without_blobs(text):
+    manifest, blobs = split_document(text)
+    assert blobs == {}
+    assert join_document(manifest, fetcher({})) == text
+
+
+def test_plain_values_skip_blob_lookup():
+    calls = []
+    for stored in (None, "", "plain text", '{"a": 1}'):
+        assert join_document(stored, fetcher({}, calls)) == stored
+    assert calls == []
+
+
+def test_missing_blob_is_an_error():
+    blob_store = {}
+    manifest = store(make_prompt(0), blob_store)
+    with pytest.raises(ValueError):
+        join_document(manifest, fetcher({}))
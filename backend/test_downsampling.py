@@ -0,0 +1,57 @@
+import random
+from app.services.downsampling import lttb_indices
+
+
+# 原始逐点实现（Steinarsson的LTTB），作为向量化实现的对照
+def reference_lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+    every = (n - 2) / (threshold - 2)
+    selected = [0]
+    a = 0
+    for i in range(threshold - 2):
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        range_start = int(i * every) + 1
+        range_end = int((i + 1) * every) + 1
+        max_area, next_a = -1, range_start
+        for j in range(range_start, range_end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > max_area:
+                max_area, next_a = area, j
+        selected.append(next_a)
+        a = next_a
+    selected.append(n - 1)
+    return selected
+
+
+def test_known_series_keeps_spike_and_dip():
+    x = list(range(10))
+    y = [0, 1, 0, 1, 10, 1, 0, -5, 0, 1]
+    assert list(lttb_indices(x, y, 5)) == [0, 2, 4, 7, 9]
+
+
+def test_bounds_and_endpoints():
+    rng = random.Random(7)
+    x = [i * 20.0 for i in range(500)]
+    y = [30 + rng.gauss(0, 1) for _ in x]
+    for max_points in (3, 10, 99, 499):
+        indices = list(lttb_indices(x, y, max_points))
+        assert len(indices) == max_points
+        assert indices[0] == 0 and indices[-1] == len(x) - 1
+        assert indices == sorted(set(indices))
+    # 点数不超过max_points（或max_points小于3）时原样返回
+    assert list(lttb_indices(x[:50], y[:50], 50)) == list(range(50))
+    assert list(lttb_indices(x[:50], y[:50], 2)) == list(range(50))
+
+
+def test_matches_reference_implementation():
+    rng = random.Random(42)
+    for n in (10, 57, 300, 1001):
+        x = sorted(rng.uniform(0, 1e6) for _ in range(n))
+        y = [rng.uniform(-100, 100) for _ in range(n)]
+        for max_points in (3, 7, n // 3, n - 1):
+            assert list(lttb_indices(x, y, max_points)) == reference_lttb(x, y, max_points), (n, max_points)
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from starlette.requests import Request
+from app.core.http_cache import check_conditional, make_etag, not_modified
+
+LAST_MODIFIED = datetime(2025, 1, 1, 12, 0, 0, 500000)  # 数据库中的无时区UTC时间
+
+
+def make_request(**headers):
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw})
+
+
+def http_date(value):
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def test_etag_match_is_weak_and_accepts_lists():
+    etag = make_etag("metrics", 3)
+    assert etag.startswith('W/"') and etag == make_etag("metrics", 3) != make_etag("metrics", 4)
+    opaque = etag[2:]
+    for header in (etag, opaque, f'W/"other", {etag}', "*"):
+        assert check_conditional(make_request(if_none_match=header), etag)[0], header
+    assert not check_conditional(make_request(if_none_match='W/"other"'), etag)[0]
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    etag = make_etag("chats", 1)
+    since = http_date(LAST_MODIFIED + timedelta(hours=1))
+    # ETag不匹配时即使If-Modified-Since表示未修改也要返回新内容
+    request = make_request(if_none_match='W/"other"', if_modified_since=since)
+    assert check_conditional(request, etag, LAST_MODIFIED)[0] is False
+    request = make_request(if_none_match=etag, if_modified_since=http_date(LAST_MODIFIED - timedelta(hours=1)))
+    assert check_conditional(request, etag, LAST_MODIFIED)[0] is True
+
+
+def test_if_modified_since_uses_second_precision():
+    etag = make_etag("pricing", 1)
+    unchanged, headers = check_conditional(make_request(if_modified_since=http_date(LAST_MODIFIED.replace(microsecond=0))),
+                                           etag, LAST_MODIFIED)
+    assert unchanged
+    assert headers == {"ETag": etag, "Cache-Control": "no-cache", "Last-Modified": "Wed, 01 Jan 2025 12:00:00 GMT"}
+    assert not check_conditional(make_request(if_modified_since=http_date(LAST_MODIFIED - timedelta(seconds=1))),
+                                 etag, LAST_MODIFIED)[0]
+    # 无法解析的日期和没有Last-Modified时都按已修改处理
+    assert not check_conditional(make_request(if_modified_since="yesterday"), etag, LAST_MODIFIED)[0]
+    assert not check_conditional(make_request(if_modified_since=http_date(LAST_MODIFIED)), etag)[0]
+
+
+def test_not_modified_response():
+    response = not_modified({"ETag": 'W/"abc"', "Cache-Control": "no-cache"})
+    assert response.status_code == 304 and response.body == b""
+    assert response.headers["etag"] == 'W/"abc"'
@@ -0,0 +1,198 @@
+import random
+from app.services import indicators
+from app.services.indicators import INDICATOR_TOLERANCE
+
+
+# 原始逐步循环实现，作为向量化指标的对照
+def legacy_ema(prices, period):
+    if len(prices) < period:
+        return prices[-1] if prices else 0
+    ema = sum(prices[:period]) / period
+    multiplier = 2 / (period + 1)
+    for price in prices[period:]:
+        ema = (price - ema) * multiplier + ema
+    return ema
+
+
+def legacy_macd(prices, fast_period=12, slow_period=26, signal_period=9):
+    if len(prices) < slow_period:
+        return {"macd": 0, "signal": 0, "histogram": 0}
+    fast_ema, slow_ema = [], []
+    multiplier_fast = 2 / (fast_period + 1)
+    multiplier_slow = 2 / (slow_period + 1)
+    fast_sma = sum(prices[:fast_period]) / fast_period
+    slow_sma = sum(prices[:slow_period]) / slow_period
+    fast_ema_value, slow_ema_value = fast_sma, slow_sma
+    for i, price in enumerate(prices):
+        if i < fast_period - 1:
+            fast_ema.append(fast_sma)
+        else:
+            fast_ema_value = (price - fast_ema_value) * multiplier_fast + fast_ema_value
+            fast_ema.append(fast_ema_value)
+        if i < slow_period - 1:
+            slow_ema.append(slow_sma)
+        else:
+            slow_ema_value = (price - slow_ema_value) * multiplier_slow + slow_ema_value
+            slow_ema.append(slow_ema_value)
+    macd_line = [fast_ema[i] - slow_ema[i] for i in range(len(fast_ema))]
+    signal_line = []
+    signal_sma = sum(macd_line[-signal_period:]) / signal_period if len(macd_line) >= signal_period else 0
+    signal_ema = signal_sma
+    for i, macd in enumerate(macd_line[-signal_period:]):
+        if i == 0:
+            signal_line.append(signal_sma)
+        else:
+            signal_ema = (macd - signal_ema) * (2 / (signal_period + 1)) + signal_ema
+            signal_line.append(signal_ema)
+    return {
+        "macd": macd_line[-1],
+        "signal": signal_line[-1] if signal_line else 0,
+        "histogram": macd_line[-1] - (signal_line[-1] if signal_line else 0),
+    }
+
+
+def legacy_rsi(prices, period=14):
+    if len(prices) < period + 1:
+        return 50
+    deltas = [prices[i] - prices[i - 1] for i in range(1, len(prices))]
+    gains = [delta if delta > 0 else 0 for delta in deltas]
+    losses = [-delta if delta < 0 else 0 for delta in deltas]
+    avg_gain = sum(gains[:period]) / period
+    avg_loss = sum(losses[:period]) / period
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+    if avg_loss == 0:
+        return 100
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def legacy_atr(ohlcv, period):
+    if len(ohlcv) < period + 1:
+        return 0
+    tr_values = []
+    for i in range(1, len(ohlcv)):
+        high, low, prev_close = ohlcv[i][2], ohlcv[i][3], ohlcv[i - 1][4]
+        tr_values.append(max(high - low, abs(high - prev_close), abs(low - prev_close)))
+    return sum(tr_values[-period:]) / period
+
+
+def make_candles(count, start_price, seed):
+    rng = random.Random(seed)
+    candles, price = [], start_price
+    for i in range(count):
+        open_price = price
+        price = max(price * (1 + rng.gauss(0, 0.004)), 1e-6)
+        high = max(open_price, price) * (1 + abs(rng.gauss(0, 0.001)))
+        low = min(open_price, price) * (1 - abs(rng.gauss(0, 0.001)))
+        candles.append([i * 60000, open_price, high, low, price, rng.uniform(1, 1000)])
+    return candles
+
+
+def assert_close(actual, expected, label):
+    assert abs(actual - expected) <= INDICATOR_TOLERANCE * max(1.0, abs(expected)), \
+        f"{label}: {actual} != {expected}"
+
+
+def test_series_match_legacy():
+    for seed, start_price in [(1, 0.2), (2, 65000.0), (3, 3.5)]:
+        candles = make_candles(120, start_price, seed)
+        closes = [c[4] for c in candles]
+        ema20 = indicators.ema_series(closes, 20)
+        macd = indicators.macd_series(closes)
+        rsi7 = indicators.rsi_series(closes, 7)
+        rsi14 = indicators.rsi_series(closes, 14)
+        atr3 = indicators.atr_series(candles, 3)
+        for i in range(1, len(closes) + 1):
+            prefix = closes[:i]
+            if i >= 20:
+                assert_close(ema20[i - 1], legacy_ema(prefix, 20), f"ema20[{i}]")
+            if i >= 26:
+                expected = legacy_macd(prefix)
+                for key in ("macd", "signal", "histogram"):
+                    assert_close(macd[key][i - 1], expected[key], f"macd.{key}[{i}]")
+            assert_close(rsi7[i - 1], legacy_rsi(prefix, 7), f"rsi7[{i}]")
+            assert_close(rsi14[i - 1], legacy_rsi(prefix, 14), f"rsi14[{i}]")
+            assert_close(atr3[i - 1], legacy_atr(candles[:i], 3), f"atr3[{i}]")
+
+
+def test_long_series_stay_finite():
+    # 分块递推在长序列上不应溢出
+    candles = make_candles(5000, 100.0, 4)
+    closes = [c[4] for c in candles]
+    assert_close(indicators.ema_series(closes, 2)[-1], legacy_ema(closes, 2), "ema2")
+    assert_close(indicators.rsi_series(closes, 14)[-1], legacy_rsi(closes, 14), "rsi14")
+    assert_close(indicators.macd_series(closes)["signal"][-1], legacy_macd(closes)["signal"], "signal")
+
+
+def test_flat_prices():
+    closes = [1.0] * 40
+    assert indicators.rsi_series(closes, 14)[-1] == 100
+    assert_close(indicators.macd_series(closes)["macd"][-1], 0, "flat macd")
+
+
+def assert_snapshot_matches(state, candles):
+    closes = [c[4] for c in candles]
+    snapshot = state.snapshot()
+    assert_close(snapshot["ema20"], legacy_ema(closes, 20), "stream ema20")
+    if len(closes) >= 50:
+        assert_close(snapshot["ema50"], legacy_ema(closes, 50), "stream ema50")
+    else:
+        assert snapshot["ema50"] is None
+    for key, value in legacy_macd(closes).items():
+        assert_close(snapshot["macd"][key], value, f"stream macd.{key}")
+    assert_close(snapshot["rsi7"], legacy_rsi(closes, 7), "stream rsi7")
+    assert_close(snapshot["rsi14"], legacy_rsi(closes, 14), "stream rsi14")
+    assert_close(snapshot["atr3"], legacy_atr(candles, 3), "stream atr3")
+    assert_close(snapshot["atr14"], legacy_atr(candles, 14), "stream atr14")
+    expected_series = [legacy_ema(closes[:i], 20) for i in range(len(closes) - 9, len(closes) + 1)]
+    for actual, expected in zip(snapshot["series"]["ema20"], expected_series):
+        assert_close(actual, expected, "stream ema20 series")
+    assert snapshot["closes"] == closes[-10:]
+
+
+def test_streaming_state_matches_batch():
+    candles = make_candles(160, 0.2, 5)
+    # 预热阶段（不足WARMUP_CANDLES）和增量阶段都应与整段重算一致
+    for initial in (30, 100):
+        state = indicators.IndicatorState("1m")
+        state.sync(candles[:initial])
+        assert_snapshot_matches(state, candles[:initial])
+        for end in range(initial + 1, len(candles) + 1):
+            # 未收盘K线先以中间价格出现，再被修订为最终值
+            forming = list(candles[end - 1])
+            forming[4] = (forming[1] + forming[4]) / 2
+            state.sync(candles[end - 3:end - 1] + [forming])
+            assert_snapshot_matches(state, candles[:end - 1] + [forming])
+            state.sync(candles[end - 3:end])
+            assert_snapshot_matches(state, candles[:end])
+
+
+def test_streaming_state_resets_on_gap():
+    candles = make_candles(200, 3.5, 6)
+    state = indicators.IndicatorState("1m")
+    state.sync(candles[:80])
+    state.sync(candles[120:200])
+    assert_snapshot_matches(state, candles[120:200])
+
+
+def test_long_window_leaves_warmup():
+    from app.services.binance_service import LONG_LIMIT, LONG_TIMEFRAME
+    step = indicators.timeframe_to_ms(LONG_TIMEFRAME)
+    candles = [[i * step] + candle[1:] for i, candle in enumerate(make_candles(LONG_LIMIT, 0.2, 7))]
+    state = indicators.IndicatorState(LONG_TIMEFRAME)
+    state.sync(candles)
+    # 一次sync之后就应使用增量状态，而不是每次都整段重算
+    assert state.closed_count >= indicators.WARMUP_CANDLES
+    assert state._closed is not None
+    assert_snapshot_matches(state, candles)
+
+
+if __name__ == "__main__":
+    test_series_match_legacy()
+    test_long_series_stay_finite()
+    test_flat_prices()
+    test_streaming_state_matches_batch()
+    test_streaming_state_resets_on_gap()
+    test_long_window_leaves_warmup()
+    print("Indicator engine matches legacy implementations!")
@@ -2,6 +2,7 @@ import asyncio
 import json
 from app.services.binance_service import BinanceService
 from app.services.ai_service import AIService
+from app.services.exchange import close_exchange
 
 async def test_indicators():
     print("Testing market indicators...")
@@ -12,6 +13,7 @@ async def test_indicators():
     
     # 获取市场状态
     market_state = await binance_service.get_current_market_state("BTC/USDT")
+    await close_exchange()
     
     # 模拟账户信息
     account_info = {
@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+from app.models.trading import MetricRollup
+from app.services import metric_store
+
+
+def rollup_rows(db, resolution):
+    rows = db.query(MetricRollup).filter(MetricRollup.resolution == resolution) \
+             .order_by(MetricRollup.bucket_start.asc()).all()
+    return [(row.bucket_start, row.open_value, row.high_value, row.low_value, row.close_value,
+             row.min_return, row.max_return, row.close_return, row.point_count) for row in rows]
+
+
+def test_record_point_updates_rollups(db_session):
+    # db_session使用默认的autoflush：聚合层级的查询不能提前写入未填充完的时间桶
+    db = db_session
+    start = datetime(2025, 1, 1, 0, 0, 0)
+    values = [30, 32, 29, 31, 35, 33, 28, 30, 34, 36, 31, 30, 29, 33, 32, 30, 31, 35, 34, 33]
+    for i, value in enumerate(values):
+        # 每个点间隔1分钟，20个点跨越4个5分钟桶
+        metric_store.record_point(db, {"totalCashValue": value, "currentTotalReturn": value / 100 - 0.3,
+                                       "availableCash": 10}, created_at=start + timedelta(minutes=i))
+
+    five_minutes = rollup_rows(db, "5m")
+    assert [row[0] for row in five_minutes] == [start + timedelta(minutes=5 * i) for i in range(4)]
+    assert five_minutes[0][1:5] == (30, 35, 29, 35)
+    assert five_minutes[1][1:5] == (33, 36, 28, 36)
+    assert all(row[-1] == 5 for row in five_minutes)
+    assert rollup_rows(db, "1h")[0][1:5] == (30, 36, 28, 33)
+    assert rollup_rows(db, "1h")[0][-1] == 20
+
+    # 由原始点重新生成的聚合与逐点更新的结果一致
+    expected = {resolution: rollup_rows(db, resolution) for resolution in metric_store.ROLLUP_RESOLUTIONS}
+    metric_store.rebuild_rollups(db)
+    assert {resolution: rollup_rows(db, resolution) for resolution in metric_store.ROLLUP_RESOLUTIONS} == expected
+
+
+def test_choose_resolution():
+    now = datetime(2025, 6, 1)
+
+    def choose(span, max_points):
+        return metric_store.choose_resolution(now - span, now, max_points, now, max_rows=10000)
+
+    # 短范围没有层级能填满图表，使用最细的原始点
+    assert choose(timedelta(hours=1), 1000) == "20s"
+    # 长范围选择点数仍不少于图表点数的最粗层级，而不是读取上限以内最细的层级
+    assert choose(timedelta(days=2), 200) == "5m"
+    assert choose(timedelta(days=7), 150) == "1h"
+    assert choose(timedelta(days=90), 500) == "1h"
+    assert choose(timedelta(days=3 * 365), 500) == "1d"
+    # 原始点超过读取上限时，即使填不满图表也使用聚合层级
+    assert choose(timedelta(days=3), 1000) == "5m"
+    # 超出5m层级保留期的范围只能使用更粗的层级
+    assert choose(timedelta(days=400), 5000) == "1h"
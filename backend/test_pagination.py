@@ -0,0 +1,56 @@
+from datetime import datetime
+from app.core.pagination import decode_cursor, keyset_page
+from app.models.trading import Chat
+
+
+def add_chats(db, created_at_values):
+    for created_at in created_at_values:
+        chat = Chat(chat="{}", reasoning="r", user_prompt="p")
+        if created_at is not None:
+            chat.created_at = created_at
+        db.add(chat)
+    db.commit()
+    db.expunge_all()
+
+
+def page_through(db, limit):
+    """按游标翻页（游标经过字符串编码和解析，与接口一致），返回所有页的记录id"""
+    ids, cursor = [], None
+    while True:
+        chats, next_cursor = keyset_page(db.query(Chat), Chat.created_at, Chat.id, cursor, limit)
+        ids.extend(chat.id for chat in chats)
+        if next_cursor is None:
+            return ids
+        cursor = decode_cursor(next_cursor)
+
+
+def expected_order(db):
+    chats = db.query(Chat).all()
+    return [chat.id for chat in sorted(chats, key=lambda chat: (chat.created_at, chat.id), reverse=True)]
+
+
+def test_pages_have_no_gaps_or_duplicates(db_session):
+    db = db_session
+    # server_default写入的时间没有微秒，同一秒内的多条记录共用一个时间
+    add_chats(db, [None] * 7)
+    same_second = datetime(2025, 1, 1, 12, 0, 0)
+    add_chats(db, [same_second] * 5)
+    add_chats(db, [datetime(2025, 1, 1, 12, 0, 0, 250000)] * 3 + [datetime(2025, 1, 1, 11, 59, 59, 999999)] * 2)
+
+    expected = expected_order(db)
+    assert len(expected) == 17
+    for limit in (1, 2, 3, 5, 17, 50):
+        ids = page_through(db, limit)
+        assert len(ids) == len(set(ids)), limit
+        assert ids == expected, limit
+
+
+def test_next_cursor_only_when_page_is_full(db_session):
+    db = db_session
+    add_chats(db, [None] * 4)
+    chats, next_cursor = keyset_page(db.query(Chat), Chat.created_at, Chat.id, None, 4)
+    assert len(chats) == 4 and next_cursor is not None
+    chats, next_cursor = keyset_page(db.query(Chat), Chat.created_at, Chat.id, decode_cursor(next_cursor), 4)
+    assert chats == [] and next_cursor is None
+    chats, next_cursor = keyset_page(db.query(Chat), Chat.created_at, Chat.id, None, 5)
+    assert len(chats) == 4 and next_cursor is None
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from app.services.rate_limiter import (
+    PRIORITY_HIGH, PRIORITY_LOW, RequestShed, WeightScheduler, request_priority,
+)
+
+
+def test_low_priority_cannot_use_reserved_weight():
+    async def run():
+        scheduler = WeightScheduler(limit=100, window=60, reserve=20, max_wait=0)
+        await scheduler.acquire(80, PRIORITY_LOW)
+        with pytest.raises(RequestShed):
+            await scheduler.acquire(1, PRIORITY_LOW)
+        # 保留的额度仍可供高优先级请求使用
+        await scheduler.acquire(20, PRIORITY_HIGH)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    usage = scheduler.get_usage()
+    assert usage["used"] == 100 and usage["available_for_low_priority"] == 0
+    assert scheduler.stats[PRIORITY_LOW] == {"requests": 1, "weight": 80, "waited": 0, "shed": 1}
+    assert scheduler.stats[PRIORITY_HIGH]["weight"] == 20
+
+
+def test_low_priority_yields_to_waiting_high_priority():
+    async def run():
+        scheduler = WeightScheduler(limit=10, window=0.2, reserve=0, max_wait=1)
+        await scheduler.acquire(10, PRIORITY_HIGH)
+        order = []
+
+        async def request(weight, priority):
+            await scheduler.acquire(weight, priority)
+            order.append(priority)
+
+        high = asyncio.create_task(request(5, PRIORITY_HIGH))
+        await asyncio.sleep(0)
+        await asyncio.gather(request(1, PRIORITY_LOW), high)
+        return order, scheduler
+
+    order, scheduler = asyncio.run(run())
+    assert order == [PRIORITY_HIGH, PRIORITY_LOW]
+    assert scheduler.stats[PRIORITY_LOW]["waited"] == 1
+    assert scheduler.get_usage()["high_priority_waiting"] == 0
+
+
+def test_server_reported_weight_counts_against_budget():
+    async def run():
+        scheduler = WeightScheduler(limit=100, window=60, reserve=20, max_wait=0)
+        scheduler.observe_headers({"X-MBX-USED-WEIGHT-1M": "90"})
+        with pytest.raises(RequestShed):
+            await scheduler.acquire(1, PRIORITY_LOW)
+        await scheduler.acquire(10, PRIORITY_HIGH)
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.get_usage()["server_used"] == 90
+    assert scheduler.used() == 90
+
+
+def test_priority_for_api():
+    scheduler = WeightScheduler()
+    assert scheduler.is_scheduled("fapiPrivate") and not scheduler.is_scheduled("public")
+    assert scheduler.priority_for("fapiPrivateV2") == PRIORITY_HIGH
+    assert scheduler.priority_for("fapiPublic") == PRIORITY_LOW
+    with request_priority(PRIORITY_HIGH):
+        assert scheduler.priority_for("fapiPublic") == PRIORITY_HIGH
+    assert scheduler.priority_for("fapiPublic") == PRIORITY_LOW
@@ -0,0 +1,27 @@
+import asyncio
+from app.services.scheduler import JobScheduler
+
+
+async def noop():
+    pass
+
+
+def test_jobs_do_not_overlap():
+    async def run():
+        scheduler = JobScheduler()
+        scheduler.add_job("decision", noop, 180)
+        scheduler.add_job("metrics", noop, 20, jitter=2)
+        scheduler.start()
+        try:
+            jobs = {job.id: job for job in scheduler._scheduler.get_jobs()}
+        finally:
+            scheduler.stop()
+        return jobs
+
+    jobs = asyncio.run(run())
+    assert set(jobs) == {"decision", "metrics"}
+    # 同一任务同时最多一个实例，错过的多次执行合并为一次
+    for job in jobs.values():
+        assert job.max_instances == 1
+        assert job.coalesce is True
+    assert jobs["metrics"].trigger.interval.total_seconds() == 20
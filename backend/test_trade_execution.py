@@ -1,6 +1,7 @@
 import asyncio
 import json
 from app.services.trading_executor import TradingExecutor
+from app.services.exchange import close_exchange
 
 async def test_trade_execution():
     print("Testing trade execution...")
@@ -19,7 +20,7 @@ async def test_trade_execution():
     }
     
     print("Executing BUY decision...")
-    result = executor.execute_trade("DOGE/USDT", buy_decision)
+    result = await executor.execute_trade("DOGE/USDT", buy_decision)
     print(f"Result: {json.dumps(result, indent=2)}")
     
     # 模拟一个SELL决策
@@ -33,7 +34,7 @@ async def test_trade_execution():
     }
     
     print("\nExecuting SELL decision...")
-    result = executor.execute_trade("DOGE/USDT", sell_decision)
+    result = await executor.execute_trade("DOGE/USDT", sell_decision)
     print(f"Result: {json.dumps(result, indent=2)}")
     
     # 模拟一个HOLD决策
@@ -44,8 +45,11 @@ async def test_trade_execution():
     }
     
     print("\nExecuting HOLD decision...")
-    result = executor.execute_trade("DOGE/USDT", hold_decision)
+    result = await executor.execute_trade("DOGE/USDT", hold_decision)
     print(f"Result: {json.dumps(result, indent=2)}")
+    
+    # 关闭共享的交易所客户端
+    await close_exchange()
 
 if __name__ == "__main__":
     asyncio.run(test_trade_execution())
\ No newline at end of file
@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app.core.pagination import keyset_page
+from app.models.trading import Chat, Trading
+from app.api.trading import completed_trades_query, serialize_trade
+
+
+def add_trades(db, trade_count):
+    start = datetime(2025, 1, 1)
+    for i in range(trade_count):
+        chat = Chat(chat="{}", reasoning="r", user_prompt="p", created_at=start + timedelta(minutes=3 * i))
+        db.add(chat)
+        db.add(Trading(symbol="DOGE/USDT", operation="BUY", chat=chat, created_at=start + timedelta(minutes=3 * i)))
+    db.commit()
+    db.expunge_all()
+
+
+def count_queries(engine, func):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        result = func()
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+    return result, statements
+
+
+def test_completed_trades_single_query(db_session):
+    db = db_session
+    add_trades(db, 60)
+
+    def load_page():
+        trades, _ = keyset_page(completed_trades_query(db), Trading.created_at, Trading.id, None, 50)
+        return [serialize_trade(trade) for trade in trades]
+
+    trade_list, statements = count_queries(db.get_bind(), load_page)
+    assert len(trade_list) == 50
+    assert all(trade["chat_model"] == "Deepseek" and trade["chat_created_at"] for trade in trade_list)
+    # 交易记录和聊天记录在同一条语句中加载，序列化时不再逐行查询
+    assert len(statements) == 1, statements
+    # 聊天记录只加载需要的列，不读取提示词
+    assert "user_prompt" not in statements[0]
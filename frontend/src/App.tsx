@@ -23,8 +23,10 @@ interface ChatData {
   id: string;
   model: string;
   chat: any;
+  recommendation?: string | null;
+  risk_level?: string | null;
   reasoning: string;
-  user_prompt: string;
+  user_prompt?: string;
   created_at: string;
   updated_at: string;
 }
@@ -176,6 +178,7 @@ function App() {
   const [totalCount, setTotalCount] = useState<number>(0);
   const [pricing, setPricing] = useState<CryptoPricing | null>(null);
   const [chats, setChats] = useState<ChatData[]>([]); // 添加聊天记录状态
+  const [chatPrompts, setChatPrompts] = useState<{[key: string]: string}>({}); // 按需加载的提示词
   const [completedTrades, setCompletedTrades] = useState<CompletedTrade[]>([]); // 添加已完成交易状态
   const [loading, setLoading] = useState<boolean>(true);
   const [chatsLoading, setChatsLoading] = useState<boolean>(true); // 添加聊天记录加载状态
@@ -213,6 +216,19 @@ function App() {
     return true;
   };
 
+  // 应用新的指标数据（轮询结果或推送快照）
+  const applyMetrics = useCallback((newMetricsData: MetricData[], newTotalCount: number) => {
+    // 优化：即使数据相同也更新最后更新时间，让用户知道系统在正常运行
+    setLastUpdate(new Date().toLocaleTimeString());
+    
+    // 只有在数据真正发生变化时才更新状态
+    if (!deepEqual(newMetricsData, prevMetricsDataRef.current)) {
+      setMetricsData(newMetricsData);
+      setTotalCount(newTotalCount);
+      prevMetricsDataRef.current = newMetricsData;
+    }
+  }, []);
+
   // 获取图表数据
   const fetchMetrics = useCallback(async () => {
     try {
@@ -224,19 +240,7 @@ function App() {
 
       const data = await response.json();
       if (data.success && data.data) {
-        // 只有在数据真正发生变化时才更新状态
-        const newMetricsData = data.data.metrics || [];
-        const newTotalCount = data.data.totalCount || 0;
-        
-        // 优化：即使数据相同也更新最后更新时间，让用户知道系统在正常运行
-        setLastUpdate(new Date().toLocaleTimeString());
-        
-        if (!deepEqual(newMetricsData, prevMetricsDataRef.current) || 
-            newTotalCount !== totalCount) {
-          setMetricsData(newMetricsData);
-          setTotalCount(newTotalCount);
-          prevMetricsDataRef.current = newMetricsData;
-        }
+        applyMetrics(data.data.metrics || [], data.data.totalCount || 0);
       }
     } catch (err) {
       console.error('Error fetching metrics:', err);
@@ -244,7 +248,42 @@ function App() {
     } finally {
       setLoading(false);
     }
-  }, [totalCount]);
+  }, [applyMetrics]);
+
+  // 应用新的价格数据（轮询结果、推送快照或合并增量后的完整价格）
+  const applyPricing = useCallback((newPricing: CryptoPricing) => {
+    const symbols = ['btc', 'eth', 'sol', 'bnb', 'doge'];
+    
+    // 使用更安全的浮点数比较
+    const arePricesEqual = (a: number, b: number): boolean => {
+      return Math.abs(a - b) < 0.0001;
+    };
+    
+    // 检查每个货币的价格是否发生变化
+    const changedSymbols = symbols.filter(symbol => {
+      const currentPrice = newPricing[symbol as keyof CryptoPricing]?.current_price || 0;
+      const previousPrice = prevPricingRef.current?.[symbol as keyof CryptoPricing]?.current_price || 0;
+      return !arePricesEqual(currentPrice, previousPrice);
+    });
+    
+    // 如果没有任何价格变化，不更新任何状态
+    if (changedSymbols.length === 0) {
+      return;
+    }
+    
+    // 只有当价格真正发生变化时才更新历史记录
+    setPriceHistory(prevHistory => {
+      const newPriceHistory = { ...prevHistory };
+      changedSymbols.forEach(symbol => {
+        const currentPrice = newPricing[symbol as keyof CryptoPricing]?.current_price || 0;
+        // 只保留最近5个价格点用于动画
+        newPriceHistory[symbol] = [...(newPriceHistory[symbol] || []).slice(-4), currentPrice];
+      });
+      return newPriceHistory;
+    });
+    setPricing(newPricing);
+    prevPricingRef.current = newPricing;
+  }, []);
 
   // 获取价格数据（使用优化的API端点）
   const fetchPricing = useCallback(async () => {
@@ -258,77 +297,20 @@ function App() {
 
       const data = await response.json();
       if (data.success && data.data.pricing) {
-        const newPricing = data.data.pricing as CryptoPricing;
-        
-        // 检查是否有任何价格发生了变化
-        const symbols = ['btc', 'eth', 'sol', 'bnb', 'doge'];
-        let hasAnyPriceChanged = false;
-        
-        // 检查每个货币的价格是否发生变化
-        for (const symbol of symbols) {
-          const currentPrice = newPricing[symbol as keyof CryptoPricing]?.current_price || 0;
-          const previousPrice = prevPricingRef.current?.[symbol as keyof CryptoPricing]?.current_price || 0;
-          
-          // 使用更安全的浮点数比较
-          const arePricesEqual = (a: number, b: number): boolean => {
-            return Math.abs(a - b) < 0.0001;
-          };
-          
-          if (!arePricesEqual(currentPrice, previousPrice)) {
-            hasAnyPriceChanged = true;
-            break;
-          }
-        }
-        
-        // 只有当有任何价格发生变化时才更新状态和历史记录
-        if (hasAnyPriceChanged) {
-          // 更新价格历史记录
-          const newPriceHistory = { ...priceHistory };
-          let hasHistoryUpdated = false;
-          
-          symbols.forEach(symbol => {
-            const currentPrice = newPricing[symbol as keyof CryptoPricing]?.current_price || 0;
-            const previousPrice = prevPricingRef.current?.[symbol as keyof CryptoPricing]?.current_price || 0;
-            
-            // 使用更安全的浮点数比较
-            const arePricesEqual = (a: number, b: number): boolean => {
-              return Math.abs(a - b) < 0.0001;
-            };
-            
-            // 只有当价格真正发生变化时才更新历史记录
-            if (!arePricesEqual(currentPrice, previousPrice)) {
-              if (!newPriceHistory[symbol]) {
-                newPriceHistory[symbol] = [];
-              }
-              
-              // 只保留最近5个价格点用于动画
-              newPriceHistory[symbol] = [...newPriceHistory[symbol].slice(-4), currentPrice];
-              hasHistoryUpdated = true;
-            }
-          });
-          
-          // 只有当历史记录真正更新时才设置状态
-          if (hasHistoryUpdated) {
-            setPriceHistory(newPriceHistory);
-            setPricing(newPricing);
-            prevPricingRef.current = newPricing;
-          }
-        }
-        // 如果没有任何价格变化，不更新任何状态
+        applyPricing(data.data.pricing as CryptoPricing);
       }
     } catch (err) {
       console.error('Error fetching pricing:', err);
       setPricingError(err instanceof Error ? err.message : '获取价格数据失败');
-    } finally {
-
     }
-  }, [priceHistory]);
+  }, [applyPricing]);
 
   // 获取聊天记录数据
   const fetchChats = useCallback(async () => {
     try {
       setChatsLoading(true);
       setChatsError(null);
+      // 列表接口不包含提示词（展开时单独获取）
       const response = await fetch(`${API_BASE_URL}/api/trading/chats`);
       if (!response.ok) {
         throw new Error(`HTTP error! status: ${response.status}`);
@@ -347,6 +329,23 @@ function App() {
     }
   }, []);
 
+  // 展开聊天记录时再获取完整的提示词
+  const fetchChatPrompt = useCallback(async (chatId: string) => {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/trading/chats/${chatId}`);
+      if (!response.ok) {
+        throw new Error(`HTTP error! status: ${response.status}`);
+      }
+
+      const data = await response.json();
+      if (data.success && data.data) {
+        setChatPrompts(prev => ({ ...prev, [chatId]: data.data.user_prompt }));
+      }
+    } catch (err) {
+      console.error('Error fetching chat prompt:', err);
+    }
+  }, []);
+
   // 获取已完成交易数据
   const fetchCompletedTrades = useCallback(async () => {
     try {
@@ -370,46 +369,74 @@ function App() {
   }, []);
 
   useEffect(() => {
-    // 初始加载
-    fetchMetrics();
-    fetchPricing();
-    
-    // 如果MODEL CHAT标签是活动的，也获取聊天记录
+    // 如果MODEL CHAT标签是活动的，获取聊天记录
     if (activeTab === 'MODEL CHAT') {
       fetchChats();
     }
     
-    // 如果COMPLETED TRADES标签是活动的，也获取已完成交易数据
+    // 如果COMPLETED TRADES标签是活动的，获取已完成交易数据
     if (activeTab === 'COMPLETED TRADES') {
       fetchCompletedTrades();
     }
+  }, [fetchChats, fetchCompletedTrades, activeTab]);
 
-    // 优化指标获取频率：从10秒增加到20秒，减轻服务器压力
-    const metricsInterval = setInterval(fetchMetrics, 20000);
-    // 价格更新频率可以更高，因为使用了优化的API
-    const pricingInterval = setInterval(fetchPricing, 5000);
-    
-    // 聊天记录更新频率 - 每3分钟更新一次
-    const chatsInterval = setInterval(() => {
-      if (activeTab === 'MODEL CHAT') {
-        fetchChats();
-      }
-    }, 180000); // 3分钟 = 180000毫秒
-    
-    // 已完成交易更新频率 - 每3分钟更新一次
-    const tradesInterval = setInterval(() => {
-      if (activeTab === 'COMPLETED TRADES') {
-        fetchCompletedTrades();
-      }
-    }, 180000); // 3分钟 = 180000毫秒
+  useEffect(() => {
+    // 不支持服务端推送的浏览器退回到轮询
+    if (typeof EventSource === 'undefined') {
+      fetchMetrics();
+      fetchPricing();
+      const metricsInterval = setInterval(fetchMetrics, 20000);
+      const pricingInterval = setInterval(fetchPricing, 5000);
+      return () => {
+        clearInterval(metricsInterval);
+        clearInterval(pricingInterval);
+      };
+    }
+
+    // 所有更新通过一个服务端推送连接获得：先收到完整快照，之后只收到增量
+    const source = new EventSource(`${API_BASE_URL}/api/stream/`);
+
+    source.addEventListener('snapshot', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      setError(null);
+      setPricingError(null);
+      applyPricing(data.pricing as CryptoPricing);
+      applyMetrics(data.metrics?.metrics || [], data.metrics?.totalCount || 0);
+      setLoading(false);
+    });
+
+    source.addEventListener('prices', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      // 增量只包含变化的交易对，合并到当前价格上
+      applyPricing({ ...prevPricingRef.current, ...data.pricing } as CryptoPricing);
+    });
+
+    source.addEventListener('metric', (event) => {
+      const point = JSON.parse((event as MessageEvent).data) as MetricData;
+      // 与 /api/metrics 一致，只保留最新的150个点
+      const newMetricsData = [...prevMetricsDataRef.current, point].slice(-150);
+      applyMetrics(newMetricsData, newMetricsData.length);
+    });
+
+    source.addEventListener('chat', (event) => {
+      const chat = JSON.parse((event as MessageEvent).data) as ChatData;
+      setChats(prevChats => [chat, ...prevChats.filter(item => item.id !== chat.id)]);
+    });
+
+    source.addEventListener('trade', (event) => {
+      const trade = JSON.parse((event as MessageEvent).data) as CompletedTrade;
+      setCompletedTrades(prevTrades => [trade, ...prevTrades.filter(item => item.id !== trade.id)]);
+    });
+
+    // 连接断开时浏览器会自动重连，重连后会重新收到快照
+    source.onerror = () => {
+      setPricingError('实时连接已断开，正在重连');
+    };
 
     return () => {
-      clearInterval(metricsInterval);
-      clearInterval(pricingInterval);
-      clearInterval(chatsInterval);
-      clearInterval(tradesInterval);
+      source.close();
     };
-  }, [fetchMetrics, fetchPricing, fetchChats, fetchCompletedTrades, activeTab]);
+  }, [fetchMetrics, fetchPricing, applyMetrics, applyPricing]);
 
   // 简化的图表组件
   const SimpleChart = ({ data }: { data: MetricData[] }) => {
@@ -494,6 +521,9 @@ function App() {
 
     // 切换聊天项的展开状态
     const toggleExpand = (chatId: string) => {
+      if (!expandedStates[chatId] && chatPrompts[chatId] === undefined) {
+        fetchChatPrompt(chatId);
+      }
       setExpandedStates(prev => ({
         ...prev,
         [chatId]: !prev[chatId]
@@ -565,7 +595,7 @@ function App() {
               {expandedStates[chat.id] && (
                 <div className="chat-expanded-content">
                   <div className="chat-prompt">
-                    <strong>提示词:</strong> {chat.user_prompt}
+                    <strong>提示词:</strong> {chatPrompts[chat.id] ?? '正在加载提示词...'}
                   </div>
                 </div>
               )}